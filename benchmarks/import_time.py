@@ -0,0 +1,85 @@
+"""Import-time budget check for the ``unifi`` entry point.
+
+Runs ``--help`` for the top-level group and a few subcommands under
+``python -X importtime`` and fails (exit status 1) if
+
+* a network/query dependency (requests, urllib3, jmespath) is imported, or
+* an invocation exits with a non-zero status, or
+* the best-of-N cumulative import time of unifi_cli and everything it pulls
+  in exceeds the budget.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 150] [--runs 5]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+FORBIDDEN = ('requests', 'urllib3', 'jmespath', 'charset_normalizer', 'idna')
+
+INVOCATIONS = [
+    ['--help'],
+    ['devices', '--help'],
+    ['clients', 'list', '--help'],
+    ['hotspot', 'vouchers', '--help'],
+]
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def measure(args):
+    """Return ``(cumulative_us, imported_modules)`` for one ``unifi ARGS`` run."""
+    code = f"import sys; from unifi_cli.main import cli; cli({args!r}, prog_name='unifi')"
+    # Subcommand help still loads the configuration, so give it placeholder credentials.
+    env = {'UNIFI_URL': 'https://unifi.invalid', 'UNIFI_API_KEY': 'benchmark',
+           **os.environ, 'UNIFI_NO_DAEMON': '1'}
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        errors = '\n'.join(line for line in proc.stderr.splitlines() if not line.startswith('import time:'))
+        raise RuntimeError(f"unifi {' '.join(args)} exited with status {proc.returncode}:\n{errors}")
+    total = 0
+    modules = []
+    started = False
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules.append(name)
+        if indent == 1:
+            # Interpreter start-up (site, encodings, ...) is reported before
+            # anything imported on behalf of the CLI.
+            if name.startswith('unifi_cli'):
+                started = True
+            if started:
+                total += cumulative
+    return total, modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=150, help='Maximum cumulative import time per invocation.')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per invocation; the fastest one is checked.')
+    options = parser.parse_args()
+
+    failures = 0
+    for args in INVOCATIONS:
+        label = 'unifi ' + ' '.join(args)
+        try:
+            results = [measure(args) for _ in range(options.runs)]
+        except RuntimeError as e:
+            failures += 1
+            print(f"FAILED  {label:<32} {e}")
+            continue
+        best = min(total for total, _ in results) / 1000
+        forbidden = sorted({m.split('.')[0] for _, modules in results for m in modules} & set(FORBIDDEN))
+        ok = best <= options.budget_ms and not forbidden
+        failures += not ok
+        print(f"{'OK    ' if ok else 'FAILED'}  {label:<32} {best:7.1f} ms (budget {options.budget_ms:g} ms)")
+        if forbidden:
+            print(f"        imported: {', '.join(forbidden)}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
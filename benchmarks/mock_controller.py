@@ -0,0 +1,519 @@
+"""An offline stand-in for a UniFi Network controller.
+
+Serves the integration API endpoints described in UNIFI_API.md
+(``/proxy/network/integration/v1/...``) and the classic client action
+endpoint (``/api/s/{site}/cmd/stamgr``) from a synthetic, deterministic fleet
+of configurable size, with optional injected latency and error rates.
+
+Besides the API it exposes two control endpoints:
+
+* ``GET /__mock/stats``: request, connection and injected-error counters.
+* ``POST /__mock/reset``: zero the counters and restore the initial fleet.
+
+Usage:
+    python benchmarks/mock_controller.py --port 8443 --sites 5 --devices 200 --clients 5000 --latency 20
+    UNIFI_URL=http://127.0.0.1:8443 UNIFI_API_KEY=test unifi devices list --all-sites --all
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+API_PREFIX = '/proxy/network/integration/v1'
+MAX_LIMIT = {'vouchers': 1000}
+DEFAULT_LIMIT = {'vouchers': 100}
+
+_NAMESPACE = uuid.UUID('6f1c1c3e-5d0b-4d0e-9a43-3f2b3c1d5e7a')
+_FILTER = re.compile(r"^(\w+(?:\.\w+)*)\.(eq|ne|like)\('((?:[^'\\]|\\.)*)'\)$")
+_CONTROL_PATHS = ('/__mock/stats', '/__mock/reset')
+
+def _uuid(*parts):
+    return str(uuid.uuid5(_NAMESPACE, '/'.join(str(p) for p in parts)))
+
+def _mac(prefix, i):
+    return f"{prefix}:{(i >> 16) & 0xff:02x}:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}"
+
+def _timestamp(seconds_ago=0):
+    moment = datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class Fleet:
+    """Synthetic sites, devices, clients and vouchers, generated deterministically from their counts."""
+
+    def __init__(self, sites=1, devices=50, clients=500, vouchers=200):
+        self.sizes = {'sites': sites, 'devices': devices, 'clients': clients, 'vouchers': vouchers}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        sizes = self.sizes
+        with self.lock:
+            self.sites = [
+                {'id': _uuid('site', s), 'internalReference': 'default' if s == 0 else f"site{s}",
+                 'name': 'Default' if s == 0 else f"Site {s}"}
+                for s in range(sizes['sites'])
+            ]
+            self.devices = {site['id']: self._devices(s, sizes['devices']) for s, site in enumerate(self.sites)}
+            self.clients = {
+                site['id']: self._clients(s, sizes['clients'], self.devices[site['id']])
+                for s, site in enumerate(self.sites)
+            }
+            self.vouchers = {site['id']: self._vouchers(s, sizes['vouchers']) for s, site in enumerate(self.sites)}
+            self.blocked = set()
+            self.voucher_serial = sizes['vouchers']
+
+    @staticmethod
+    def _devices(s, count):
+        models = ['U6-Pro', 'U6-LR', 'USW-Pro-24-PoE', 'USW-Lite-8-PoE', 'UDM-Pro']
+        return [
+            {'id': _uuid('device', s, i), 'name': f"AP {s}-{i}", 'model': models[i % len(models)],
+             'macAddress': _mac(f"74:ac:{s:02x}", i), 'ipAddress': f"10.{s}.{i // 250}.{i % 250 + 2}",
+             'state': 'OFFLINE' if i % 20 == 19 else 'ONLINE', 'features': ['accessPoint'] if i % 5 < 2 else ['switching'],
+             'interfaces': ['ports', 'radios'] if i % 5 < 2 else ['ports']}
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _clients(s, count, devices):
+        return [
+            {'id': _uuid('client', s, i), 'name': f"host-{s}-{i}", 'connectedAt': _timestamp(i * 37 % 86400),
+             'ipAddress': f"10.{100 + s}.{i // 250}.{i % 250 + 2}", 'access': {'type': 'DEFAULT'},
+             'type': 'WIRELESS' if i % 3 else 'WIRED', 'macAddress': _mac(f"a4:83:{s:02x}", i),
+             'uplinkDeviceId': devices[i % len(devices)]['id'] if devices else None}
+            for i in range(count)
+        ]
+
+    @staticmethod
+    def _voucher(s, i, name='Guest', **fields):
+        return {
+            'id': _uuid('voucher', s, i), 'createdAt': _timestamp(i % 604800), 'name': name,
+            'code': f"{(i * 7919 + s) % 10 ** 10:010d}", 'authorizedGuestLimit': fields.get('authorizedGuestLimit', 1),
+            'authorizedGuestCount': 0, 'activatedAt': None, 'expiresAt': None, 'expired': False,
+            'timeLimitMinutes': fields.get('timeLimitMinutes', 1440),
+            'dataUsageLimitMBytes': fields.get('dataUsageLimitMBytes'),
+            'rxRateLimitKbps': fields.get('rxRateLimitKbps'), 'txRateLimitKbps': fields.get('txRateLimitKbps'),
+        }
+
+    def _vouchers(self, s, count):
+        vouchers = []
+        for i in range(count):
+            voucher = self._voucher(s, i, name=f"Event {i % 10}")
+            if i % 4 == 0:
+                voucher.update(authorizedGuestCount=1, activatedAt=_timestamp(3600), expired=i % 8 == 0)
+            vouchers.append(voucher)
+        return vouchers
+
+    def site_index(self, site_id):
+        for s, site in enumerate(self.sites):
+            if site_id in (site['id'], site['internalReference']):
+                return s, site['id']
+        return None, None
+
+    def create_vouchers(self, site_id, body):
+        s, site_id = self.site_index(site_id)
+        fields = {k: v for k, v in body.items() if k not in ('count', 'name')}
+        with self.lock:
+            start = self.voucher_serial
+            self.voucher_serial += body['count']
+            created = [
+                self._voucher(s, i, name=body.get('name', 'Guest'), **fields)
+                for i in range(start, start + body['count'])
+            ]
+            self.vouchers[site_id].extend(created)
+        return created
+
+    def delete_voucher(self, site_id, voucher_id):
+        with self.lock:
+            vouchers = self.vouchers[site_id]
+            remaining = [v for v in vouchers if v['id'] != voucher_id]
+            self.vouchers[site_id] = remaining
+            return len(vouchers) - len(remaining)
+
+def _field(record, path):
+    for key in path.split('.'):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+def _matches(value, pattern):
+    return re.fullmatch(re.escape(pattern).replace(r'\*', '.*'), value) is not None
+
+def parse_filter(expression):
+    """Compile ``field.eq('x')``, ``field.ne('x')`` or ``field.like('x*')`` into a predicate."""
+    match = _FILTER.match(expression.strip())
+    if not match:
+        raise ValueError(f"Unsupported filter: {expression}")
+    path, op, value = match.group(1), match.group(2), match.group(3).replace("\\'", "'")
+    if op == 'eq':
+        return lambda record: str(_field(record, path)) == value
+    if op == 'ne':
+        return lambda record: str(_field(record, path)) != value
+    return lambda record: _matches(str(_field(record, path)), value)
+
+class MockController(ThreadingHTTPServer):
+    """The HTTP server. ``start()`` runs it on a background thread and returns its base URL."""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, fleet=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, seed=0):
+        super().__init__((host, port), MockHandler)
+        self.fleet = fleet or Fleet()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.counter_lock = threading.Lock()
+        self.reset_counters()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self):
+        with self.counter_lock:
+            self.requests = Counter()
+            self.endpoints = Counter()
+            self.connections = 0
+            self.active_connections = 0
+            self.peak_connections = 0
+            self.errors_injected = 0
+
+    def reset(self):
+        self.fleet.reset()
+        self.reset_counters()
+
+    def stats(self):
+        with self.counter_lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'byMethod': dict(self.requests),
+                'byEndpoint': dict(self.endpoints),
+                'connections': self.connections,
+                'activeConnections': self.active_connections,
+                'peakConnections': self.peak_connections,
+                'errorsInjected': self.errors_injected,
+            }
+
+    def connection_opened(self):
+        with self.counter_lock:
+            self.connections += 1
+            self.active_connections += 1
+            self.peak_connections = max(self.peak_connections, self.active_connections)
+
+    def connection_closed(self):
+        with self.counter_lock:
+            self.active_connections -= 1
+
+    def count_request(self, method, endpoint):
+        with self.counter_lock:
+            self.requests[method] += 1
+            self.endpoints[endpoint] += 1
+
+    def delay_and_maybe_fail(self):
+        """Sleep for the configured latency; return True if this request should fail."""
+        with self.counter_lock:
+            delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+            if fail:
+                self.errors_injected += 1
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockUniFi/1.0'
+    # Headers and body are written separately; without TCP_NODELAY, Nagle's
+    # algorithm and delayed ACKs would add ~40ms to every small response.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connection_opened()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self.server.connection_closed()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, name, message, headers=None):
+        self.send_json(status, {
+            'statusCode': status,
+            'statusName': name,
+            'message': message,
+            'timestamp': _timestamp(),
+            'requestPath': self.path,
+            'requestId': str(uuid.uuid4()),
+        }, headers)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else {}
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = self.read_body() if method == 'POST' else None
+
+        if url.path in _CONTROL_PATHS:
+            if url.path == '/__mock/reset':
+                self.server.reset()
+            return self.send_json(200, self.server.stats())
+
+        if self.headers.get('X-API-KEY') is None:
+            return self.send_error_json(401, 'UNAUTHORIZED', 'Missing X-API-KEY header.')
+
+        if url.path.startswith(API_PREFIX):
+            path = url.path[len(API_PREFIX):]
+            route = ROUTES
+        else:
+            path = url.path
+            route = CLASSIC_ROUTES
+        for route_method, pattern, endpoint, handler in route:
+            match = pattern.match(path)
+            if match and route_method == method:
+                self.server.count_request(method, endpoint)
+                if self.server.delay_and_maybe_fail():
+                    status = self.server.error_status
+                    headers = {'Retry-After': '0'} if status in (429, 503) else None
+                    return self.send_error_json(status, 'INJECTED_FAILURE', 'Injected failure.', headers)
+                try:
+                    return handler(self, query, body, *match.groups())
+                except ValueError as e:
+                    return self.send_error_json(400, 'BAD_REQUEST', str(e))
+        self.server.count_request(method, 'unknown')
+        self.send_error_json(404, 'NOT_FOUND', f"No route for {method} {url.path}.")
+
+    def site(self, site_id):
+        _, resolved = self.server.fleet.site_index(site_id)
+        if resolved is None:
+            self.send_error_json(404, 'NOT_FOUND', f"Site {site_id} not found.")
+        return resolved
+
+    def send_page(self, records, query, kind=None):
+        if 'filter' in query:
+            predicate = parse_filter(query['filter'])
+            records = [r for r in records if predicate(r)]
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', DEFAULT_LIMIT.get(kind, 25)))
+        if limit > MAX_LIMIT.get(kind, 200) or limit < 0 or offset < 0:
+            raise ValueError(f"Invalid offset/limit: {offset}/{limit}")
+        data = records[offset:offset + limit]
+        self.send_json(200, {'offset': offset, 'limit': limit, 'count': len(data),
+                             'totalCount': len(records), 'data': data})
+
+    def find(self, records, record_id, kind):
+        for record in records:
+            if record['id'] == record_id:
+                return self.send_json(200, record)
+        self.send_error_json(404, 'NOT_FOUND', f"{kind} {record_id} not found.")
+
+    # Integration API
+
+    def info(self, query, body):
+        self.send_json(200, {'applicationVersion': '9.1.120'})
+
+    def list_sites(self, query, body):
+        self.send_page(self.server.fleet.sites, query)
+
+    def list_devices(self, query, body, site_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.send_page(self.server.fleet.devices[site_id], query)
+
+    def get_device(self, query, body, site_id, device_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.find(self.server.fleet.devices[site_id], device_id, 'Device')
+
+    def device_statistics(self, query, body, site_id, device_id):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        if not any(d['id'] == device_id for d in self.server.fleet.devices[site_id]):
+            return self.send_error_json(404, 'NOT_FOUND', f"Device {device_id} not found.")
+        now = time.time()
+        seed = int(uuid.UUID(device_id)) % 1000
+        self.send_json(200, {
+            'uptimeSec': int(now) % 1000000 + seed,
+            'lastHeartbeatAt': _timestamp(5),
+            'nextHeartbeatAt': _timestamp(-25),
+            'loadAverage1Min': round((seed % 100) / 50, 2),
+            'loadAverage5Min': round((seed % 90) / 50, 2),
+            'loadAverage15Min': round((seed % 80) / 50, 2),
+            'cpuUtilizationPct': round((now + seed) % 100, 1),
+            'memoryUtilizationPct': round(30 + seed % 50, 1),
+            'uplink': {'txRateBps': int(now * 1000 + seed) % 10 ** 8, 'rxRateBps': int(now * 700 + seed) % 10 ** 8},
+            'interfaces': {},
+        })
+
+    def device_action(self, query, body, site_id, device_id, port_idx=None):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        if not any(d['id'] == device_id for d in self.server.fleet.devices[site_id]):
+            return self.send_error_json(404, 'NOT_FOUND', f"Device {device_id} not found.")
+        expected = 'RESTART' if port_idx is None else 'POWER_CYCLE'
+        if (body or {}).get('action') != expected:
+            raise ValueError(f"Unsupported action: {(body or {}).get('action')}")
+        self.send_json(200, {})
+
+    def list_clients(self, query, body, site_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.send_page(self.server.fleet.clients[site_id], query)
+
+    def get_client(self, query, body, site_id, client_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.find(self.server.fleet.clients[site_id], client_id, 'Client')
+
+    def client_action(self, query, body, site_id, client_id):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        if not any(c['id'] == client_id for c in self.server.fleet.clients[site_id]):
+            return self.send_error_json(404, 'NOT_FOUND', f"Client {client_id} not found.")
+        if (body or {}).get('action') != 'AUTHORIZE_GUEST_ACCESS':
+            raise ValueError(f"Unsupported action: {(body or {}).get('action')}")
+        self.send_json(200, {})
+
+    def list_vouchers(self, query, body, site_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.send_page(self.server.fleet.vouchers[site_id], query, kind='vouchers')
+
+    def create_vouchers(self, query, body, site_id):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        count = (body or {}).get('count')
+        if not isinstance(count, int) or not 1 <= count <= 1000:
+            raise ValueError('count must be between 1 and 1000.')
+        self.send_json(201, {'vouchers': self.server.fleet.create_vouchers(site_id, body)})
+
+    def get_voucher(self, query, body, site_id, voucher_id):
+        site_id = self.site(site_id)
+        if site_id:
+            self.find(self.server.fleet.vouchers[site_id], voucher_id, 'Voucher')
+
+    def delete_voucher(self, query, body, site_id, voucher_id):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        deleted = self.server.fleet.delete_voucher(site_id, voucher_id)
+        if not deleted:
+            return self.send_error_json(404, 'NOT_FOUND', f"Voucher {voucher_id} not found.")
+        self.send_json(200, {'vouchersDeleted': deleted})
+
+    # Classic API
+
+    def stamgr(self, query, body, site_id):
+        site_id = self.site(site_id)
+        if not site_id:
+            return
+        body = body or {}
+        cmd, mac = body.get('cmd'), (body.get('mac') or '').lower()
+        if cmd not in ('block-sta', 'unblock-sta', 'authorize-guest', 'unauthorize-guest', 'kick-sta', 'forget-sta'):
+            raise ValueError(f"Unknown cmd: {cmd}")
+        fleet = self.server.fleet
+        if cmd == 'block-sta':
+            fleet.blocked.add(mac)
+        elif cmd == 'unblock-sta':
+            fleet.blocked.discard(mac)
+        self.send_json(200, {'meta': {'rc': 'ok'}, 'data': [{'mac': mac, 'blocked': mac in fleet.blocked}]})
+
+ROUTES = [(method, re.compile(f"^{pattern}$"), endpoint, handler) for method, pattern, endpoint, handler in [
+    ('GET', r'/info', 'info', MockHandler.info),
+    ('GET', r'/sites', 'sites', MockHandler.list_sites),
+    ('GET', r'/sites/([^/]+)/devices', 'devices', MockHandler.list_devices),
+    ('GET', r'/sites/([^/]+)/devices/([^/]+)', 'device', MockHandler.get_device),
+    ('GET', r'/sites/([^/]+)/devices/([^/]+)/statistics/latest', 'statistics', MockHandler.device_statistics),
+    ('POST', r'/sites/([^/]+)/devices/([^/]+)/actions', 'device-action', MockHandler.device_action),
+    ('POST', r'/sites/([^/]+)/devices/([^/]+)/interfaces/ports/(\d+)/actions', 'port-action', MockHandler.device_action),
+    ('GET', r'/sites/([^/]+)/clients', 'clients', MockHandler.list_clients),
+    ('GET', r'/sites/([^/]+)/clients/([^/]+)', 'client', MockHandler.get_client),
+    ('POST', r'/sites/([^/]+)/clients/([^/]+)/actions', 'client-action', MockHandler.client_action),
+    ('GET', r'/sites/([^/]+)/hotspot/vouchers', 'vouchers', MockHandler.list_vouchers),
+    ('POST', r'/sites/([^/]+)/hotspot/vouchers', 'create-vouchers', MockHandler.create_vouchers),
+    ('GET', r'/sites/([^/]+)/hotspot/vouchers/([^/]+)', 'voucher', MockHandler.get_voucher),
+    ('DELETE', r'/sites/([^/]+)/hotspot/vouchers/([^/]+)', 'delete-voucher', MockHandler.delete_voucher),
+]]
+
+CLASSIC_ROUTES = [
+    ('POST', re.compile(r'^/api/s/([^/]+)/cmd/stamgr$'), 'stamgr', MockHandler.stamgr),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an offline mock UniFi Network controller.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--sites', type=int, default=1)
+    parser.add_argument('--devices', type=int, default=50, help='Devices per site.')
+    parser.add_argument('--clients', type=int, default=500, help='Clients per site.')
+    parser.add_argument('--vouchers', type=int, default=200, help='Vouchers per site.')
+    parser.add_argument('--latency', type=float, default=0, help='Added latency per request, in milliseconds.')
+    parser.add_argument('--jitter', type=float, default=0, help='Random +/- latency jitter, in milliseconds.')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests that fail (0-1).')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected failures.')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    fleet = Fleet(options.sites, options.devices, options.clients, options.vouchers)
+    server = MockController(options.host, options.port, fleet=fleet, latency=options.latency / 1000,
+                            jitter=options.jitter / 1000, error_rate=options.error_rate,
+                            error_status=options.error_status, seed=options.seed)
+    print(f"Mock controller listening on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
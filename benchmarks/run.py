@@ -0,0 +1,178 @@
+"""Benchmark the CLI's request paths against the offline mock controller.
+
+Each scenario runs the real ``unifi`` command in a fresh subprocess (with an
+empty HOME, so no cache or index is warm) against an in-process
+MockController, and records:
+
+* wall time (median over --repeat runs),
+* HTTP requests made and requests/sec,
+* TCP connections opened and the peak number open at once,
+* peak RSS of the CLI process.
+
+Results can be saved with --save and compared against a saved baseline with
+--baseline; the exit status is 1 if any scenario regressed beyond
+--tolerance, or made more requests (or noticeably more connections) than
+the baseline.
+
+Usage:
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --baseline baseline.json --tolerance 0.25
+    python benchmarks/run.py --scenario fan-out --sites 20 --latency 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from mock_controller import Fleet, MockController
+
+SCENARIOS = {
+    'info': ['info'],
+    'list-page': ['clients', 'list', '--site-id', 'Default', '--json'],
+    'list-all': ['clients', 'list', '--site-id', 'Default', '--all', '--json'],
+    'list-all-ndjson': ['clients', 'list', '--site-id', 'Default', '--all', '--format', 'ndjson'],
+    'list-all-table': ['clients', 'list', '--site-id', 'Default', '--all', '--format', 'table',
+                       '--columns', 'name,macAddress,ipAddress,type'],
+    'fan-out': ['devices', 'list', '--all-sites', '--all', '--json'],
+    # --profile over worker threads (cProfile differs between Python versions).
+    'fan-out-profile': ['--profile', 'devices', 'list', '--all-sites', '--all', '--json'],
+    'bulk-restart': ['devices', 'bulk-restart', '--site-id', 'Default', '--filter', "state.eq('ONLINE')",
+                     '--yes', '--wait-timeout', '0'],
+    'vouchers-generate-bulk': ['hotspot', 'vouchers', 'generate-bulk', '--site-id', 'Default', '--count', '5000',
+                               '--name', 'Benchmark', '--time-limit', '60', '--output', os.devnull],
+    'vouchers-purge': ['hotspot', 'vouchers', 'purge', '--site-id', 'Default', '--expired', '--yes'],
+    'sync': ['sync', '--all-sites'],
+}
+
+COMMAND = [sys.executable, '-c', 'from unifi_cli.main import cli; cli()', '--no-cache']
+
+def run_once(server, args, timeout):
+    """Run one CLI invocation against a freshly reset mock; return its measurements.
+
+    An invocation still running after ``timeout`` seconds is killed and
+    counts as failed.
+    """
+    server.reset()
+    with tempfile.TemporaryDirectory() as home:
+        env = {k: v for k, v in os.environ.items() if not k.startswith(('UNIFI_', 'XDG_'))}
+        env.update(HOME=home, UNIFI_URL=server.url, UNIFI_API_KEY='benchmark', UNIFI_NO_DAEMON='1')
+        with open(Path(home) / 'stderr', 'w+') as stderr:
+            started = time.perf_counter()
+            proc = subprocess.Popen(COMMAND + args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=stderr, env=env)
+            timer = threading.Timer(timeout, proc.kill)
+            timer.start()
+            try:
+                _, status, usage = os.wait4(proc.pid, 0)
+            finally:
+                timer.cancel()
+            elapsed = time.perf_counter() - started
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            stderr.seek(0)
+            errors = stderr.read()
+            if elapsed >= timeout:
+                errors += f"\nTimed out after {timeout:g}s"
+    stats = server.stats()
+    return {
+        'wall': elapsed,
+        'requests': stats['requests'],
+        'connections': stats['connections'],
+        'peakConnections': stats['peakConnections'],
+        'maxRssKb': usage.ru_maxrss,
+        'exitCode': proc.returncode,
+        'stderr': errors,
+    }
+
+def run_scenario(server, args, repeat, timeout):
+    runs = [run_once(server, args, timeout) for _ in range(repeat)]
+    wall = statistics.median(r['wall'] for r in runs)
+    requests = max(r['requests'] for r in runs)
+    return {
+        'wall': round(wall, 4),
+        'requests': requests,
+        'requestsPerSec': round(requests / wall, 1) if wall else 0,
+        'connections': max(r['connections'] for r in runs),
+        'peakConnections': max(r['peakConnections'] for r in runs),
+        'maxRssKb': max(r['maxRssKb'] for r in runs),
+        'failed': sum(1 for r in runs if r['exitCode'] != 0),
+        'stderr': next((r['stderr'] for r in runs if r['exitCode'] != 0), ''),
+    }
+
+def regressions(result, baseline, tolerance):
+    """Describe how ``result`` is worse than ``baseline``, if at all."""
+    problems = []
+    if result['wall'] > baseline['wall'] * (1 + tolerance):
+        problems.append(f"wall {baseline['wall']:.3f}s -> {result['wall']:.3f}s")
+    if result['maxRssKb'] > baseline['maxRssKb'] * (1 + tolerance):
+        problems.append(f"RSS {baseline['maxRssKb']} -> {result['maxRssKb']} KiB")
+    if result['requests'] > baseline['requests']:
+        problems.append(f"requests {baseline['requests']} -> {result['requests']}")
+    # How many pooled connections get opened depends on thread timing, so
+    # allow some slack before calling it a regression.
+    if result['connections'] > max(baseline['connections'] * (1 + tolerance), baseline['connections'] + 2):
+        problems.append(f"connections {baseline['connections']} -> {result['connections']}")
+    if result['failed']:
+        problems.append(f"{result['failed']} failed run(s)")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the unifi CLI against the offline mock controller.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario to run (repeatable; default: all).')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the median wall time is reported.')
+    parser.add_argument('--sites', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=200, help='Devices per site.')
+    parser.add_argument('--clients', type=int, default=2000, help='Clients per site.')
+    parser.add_argument('--vouchers', type=int, default=3000, help='Vouchers per site.')
+    parser.add_argument('--latency', type=float, default=10, help='Mock latency per request, in milliseconds.')
+    parser.add_argument('--jitter', type=float, default=0, help='Random +/- latency jitter, in milliseconds.')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests the mock fails with --error-status.')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--timeout', type=float, default=120, help='Kill a run that takes longer than this, in seconds.')
+    parser.add_argument('--save', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against results saved with --save.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown/RSS growth vs. the baseline.')
+    options = parser.parse_args()
+
+    fleet = Fleet(options.sites, options.devices, options.clients, options.vouchers)
+    server = MockController(fleet=fleet, latency=options.latency / 1000, jitter=options.jitter / 1000,
+                            error_rate=options.error_rate, error_status=options.error_status)
+    server.start()
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print(f"{'scenario':<24} {'wall':>8} {'reqs':>6} {'req/s':>8} {'conns':>6} {'peak':>5} {'RSS MiB':>8}")
+    results = {}
+    failures = 0
+    try:
+        for name in options.scenario or SCENARIOS:
+            result = run_scenario(server, SCENARIOS[name], options.repeat, options.timeout)
+            results[name] = result
+            print(f"{name:<24} {result['wall']:>7.3f}s {result['requests']:>6} {result['requestsPerSec']:>8} "
+                  f"{result['connections']:>6} {result['peakConnections']:>5} {result['maxRssKb'] / 1024:>8.1f}")
+            problems = regressions(result, baseline[name], options.tolerance) if name in baseline else []
+            if result['failed'] and not problems:
+                problems.append(f"{result['failed']} failed run(s)")
+            if problems:
+                failures += 1
+                print(f"  REGRESSION: {'; '.join(problems)}")
+                if result['stderr']:
+                    print('  ' + result['stderr'].strip().replace('\n', '\n  '))
+    finally:
+        server.stop()
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump({'options': vars(options), 'results': results}, f, indent=4)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
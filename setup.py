@@ -10,9 +10,13 @@ setup(
         'requests',
         'jmespath',
     ],
+    extras_require={
+        'fast': ['orjson'],
+        'yaml': ['PyYAML'],
+    },
     entry_points={
         'console_scripts': [
-            'unifi=unifi_cli.main:cli',
+            'unifi=unifi_cli.remote:main',
         ],
     },
 )
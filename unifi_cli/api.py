@@ -0,0 +1,235 @@
+import copy
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from . import trace
+
+API_PREFIX = '/proxy/network/integration/v1'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class RequestException(IOError):
+    """Raised when a request fails without a response (connection errors, timeouts, exhausted retries).
+
+    Wraps the underlying ``requests`` exception so that commands can catch it
+    without importing ``requests`` themselves.
+    """
+
+class ApiError(Exception):
+    """Raised when the controller answers with a non-2xx response."""
+
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} {response.reason}")
+        self.response = response
+
+def ordered_map(func, items, max_workers):
+    """Like ``map`` but runs ``func`` concurrently, yielding results in input order.
+
+    At most ``max_workers`` calls are in flight at once, so results are never
+    buffered far ahead of the consumer.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque(pool.submit(func, item) for item in islice(items, max_workers))
+        while pending:
+            result = pending.popleft().result()
+            for item in islice(items, 1):
+                pending.append(pool.submit(func, item))
+            yield result
+
+class UnifiClient:
+    """A pooled, keep-alive HTTP client for a single UniFi controller.
+
+    Paths are relative to the integration API (``/proxy/network/integration/v1``)
+    unless they start with ``/api/``, in which case they address the classic
+    controller API directly (e.g. ``/api/s/{site}/cmd/stamgr``).
+    """
+
+    def __init__(self, url, api_key, pool_size=10, timeout=30.0, connect_timeout=5.0,
+                 retries=3, backoff=0.5, max_workers=8, cache=None, index=None,
+                 refresh=False, verify=False, throttle=None):
+        self.url = url.rstrip('/')
+        self.max_workers = max_workers
+        self.cache = cache
+        self.index = index
+        self.refresh = refresh
+        self.throttle = throttle
+        self._credentials = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        self.timeout = (connect_timeout, timeout)
+        self._api_key = api_key
+        self._pool_size = pool_size
+        self._retries = retries
+        self._backoff = backoff
+        self._verify = verify
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled ``requests`` session, created (and ``requests`` imported) on first use."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self._retries,
+            backoff_factor=self._backoff,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update({
+            'X-API-KEY': self._api_key,
+            'Accept': 'application/json'
+        })
+        session.verify = self._verify
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if trace.tracer is not None:
+            trace.instrument(adapter)
+
+        if not self._verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        return session
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.url,
+            config.api_key,
+            pool_size=config.pool_size,
+            timeout=config.timeout,
+            connect_timeout=config.connect_timeout,
+            retries=config.retries,
+            backoff=config.backoff,
+            max_workers=config.max_workers,
+            cache=config.cache,
+            index=config.index,
+            refresh=config.refresh_cache,
+            throttle=config.throttle,
+        )
+
+    def derive(self, **changes):
+        """Return a copy of this client sharing its connection pool, with some attributes replaced."""
+        self.session
+        derived = copy.copy(self)
+        for name, value in changes.items():
+            setattr(derived, name, value)
+        return derived
+
+    def build_url(self, path):
+        if path.startswith('/api/'):
+            return f"{self.url}{path}"
+        return f"{self.url}{API_PREFIX}{path}"
+
+    def request(self, method, path, **kwargs):
+        from requests.exceptions import RequestException as _RequestException
+
+        kwargs.setdefault('timeout', self.timeout)
+        throttle = self.throttle
+        started = time.monotonic()
+        waited = None
+        if throttle is not None:
+            throttle.acquire()
+            waited = time.monotonic() - started
+            started += waited
+        response = None
+        try:
+            response = self.session.request(method, self.build_url(path), **kwargs)
+        except _RequestException as e:
+            raise RequestException(e) from e
+        finally:
+            elapsed = time.monotonic() - started
+            if throttle is not None:
+                throttle.release(response, elapsed)
+            if trace.tracer is not None:
+                trace.tracer.request(method, path, kwargs.get('params'), elapsed, response, waited)
+        if method != 'GET' and response.ok and self.cache is not None:
+            self.cache.invalidate(self.url, path)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def get_json(self, path, cached=True, **kwargs):
+        """GET ``path`` and return the decoded body, raising ApiError on failure.
+
+        Responses are served from and stored in the response cache, if one is
+        configured (``cached=False`` or ``refresh`` forces a fresh request), and
+        fresh responses feed the identifier index.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(self.url, self._credentials, path, kwargs.get('params'))
+            if cached and not self.refresh:
+                with trace.span('cache', path=path):
+                    data = self.cache.get(key)
+                if data is not None:
+                    return data
+
+        response = self.get(path, **kwargs)
+        if not response.ok:
+            raise ApiError(response)
+        data = response.json() if trace.tracer is None else trace.tracer.decode(response)
+
+        if key is not None:
+            self.cache.set(key, self.url, path, response.content)
+        if self.index is not None:
+            self.index.record(self.url, path, data)
+        return data
+
+    def iter_pages(self, path, params=None, page_size=200, cached=True):
+        """Yield every page of a paginated endpoint, in order.
+
+        The first page is fetched on its own to learn ``totalCount``; the
+        remaining offsets are then fetched concurrently over a bounded pool.
+        """
+        params = dict(params or {})
+        start = params.pop('offset', 0)
+
+        def fetch(offset):
+            return self.get_json(path, cached=cached, params={**params, 'offset': offset, 'limit': page_size})
+
+        first = fetch(start)
+        yield first
+        offsets = range(start + page_size, first.get('totalCount', 0), page_size)
+        yield from ordered_map(fetch, offsets, self.max_workers)
+
+    def get_all(self, path, params=None, page_size=200, cached=True):
+        """Fetch every page of a paginated endpoint and merge them into one response."""
+        data = []
+        total = 0
+        for page in self.iter_pages(path, params=params, page_size=page_size, cached=cached):
+            data.extend(page.get('data', []))
+            total = page.get('totalCount', total)
+        offset = (params or {}).get('offset', 0)
+        return {
+            'offset': offset,
+            'limit': len(data),
+            'count': len(data),
+            'totalCount': total,
+            'data': data
+        }
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
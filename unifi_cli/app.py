@@ -1,7 +1,7 @@
 import click
-import requests
 import json
 from .config import pass_config
+from .api import ApiError, RequestException
 from .util import handle_api_error, print_json_output
 
 @click.command('info')
@@ -10,16 +10,10 @@ from .util import handle_api_error, print_json_output
 @pass_config
 def info(config, json, query):
     """Get Application Info."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/info", headers=headers, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
+        data = config.client.get_json("/info")
         print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
@@ -0,0 +1,359 @@
+import os
+import json
+import time
+import hashlib
+import click
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .config import pass_config
+from .api import ApiError, RequestException
+from .throttle import RateLimiter
+from .util import dumps, format_api_error
+from .index import resolve_site, resolve_device, resolve_client, resolve_client_mac
+from .devices import restart, power_cycle
+from .clients import authorize, block, unblock
+from .hotspot import delete
+
+class Action:
+    """A plan action: the option naming its target(s), the other options it takes, and how to run it.
+
+    ``types`` maps options to the click type of the matching command option,
+    which plan values are converted with before anything runs.
+    """
+
+    def __init__(self, target, run, required=(), optional=(), types=None):
+        self.target = target
+        self.run = run
+        self.required = frozenset(required)
+        self.options = self.required | frozenset(optional)
+        self.types = types or {}
+
+def _restart(client, site_id, target, options):
+    return restart(client, site_id, resolve_device(client, site_id, target, verify=True))
+
+def _power_cycle(client, site_id, target, options):
+    return power_cycle(client, site_id, resolve_device(client, site_id, target, verify=True), options['port-idx'])
+
+def _authorize(client, site_id, target, options):
+    return authorize(client, site_id, resolve_client(client, site_id, target, verify=True),
+                     options.get('time-limit'), options.get('data-usage-limit'),
+                     options.get('rx-rate-limit'), options.get('tx-rate-limit'))
+
+def _block(client, site_id, target, options):
+    return block(client, site_id, resolve_client_mac(client, site_id, target, verify=True))
+
+def _unblock(client, site_id, target, options):
+    return unblock(client, site_id, resolve_client_mac(client, site_id, target, verify=True))
+
+def _delete_voucher(client, site_id, target, options):
+    return delete(client, site_id, target)
+
+# Action name (the matching CLI command) -> Action. Step keys use the
+# command's option names without the leading dashes.
+ACTIONS = {
+    'devices restart': Action('device-id', _restart),
+    'devices power-cycle-port': Action('device-id', _power_cycle, required=['port-idx'], types={'port-idx': click.INT}),
+    'clients authorize-guest': Action('client-id', _authorize,
+                                      optional=['time-limit', 'data-usage-limit', 'rx-rate-limit', 'tx-rate-limit'],
+                                      types={'time-limit': click.INT, 'data-usage-limit': click.INT,
+                                             'rx-rate-limit': click.INT, 'tx-rate-limit': click.INT}),
+    'clients block': Action('mac-address', _block),
+    'clients unblock': Action('mac-address', _unblock),
+    'hotspot vouchers delete': Action('voucher-id', _delete_voucher),
+}
+
+STEP_KEYS = {'id', 'action', 'site-id', 'after'}
+
+class Operation:
+    """One action against one target, keyed by its content so that checkpoints survive plan edits."""
+
+    def __init__(self, step, action_name, site, target, options):
+        self.step = step
+        self.action_name = action_name
+        self.action = ACTIONS[action_name]
+        self.site = site
+        self.target = target
+        self.options = options
+        canonical = json.dumps([step, action_name, site, target, options], sort_keys=True, default=str)
+        self.key = hashlib.blake2b(canonical.encode(), digest_size=12).hexdigest()
+
+    def result(self, status, **fields):
+        return {'step': self.step, 'action': self.action_name, 'siteId': self.site, 'target': self.target,
+                'status': status, **fields}
+
+class Step:
+    def __init__(self, id, after, operations):
+        self.id = id
+        self.after = after
+        self.operations = operations
+
+def load_plan(path):
+    """Read a plan's steps and defaults from YAML, a JSON document or NDJSON (one step per line)."""
+    if path == '-':
+        text = click.get_text_stream('stdin').read()
+    else:
+        with open(path) as f:
+            text = f.read()
+
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise click.ClickException("Reading YAML plans requires PyYAML: pip install 'unifi-cli[yaml]'")
+        try:
+            document = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise click.ClickException(f"Invalid plan: {e}")
+    else:
+        try:
+            document = json.loads(text) if text.strip() else []
+        except ValueError:
+            try:
+                document = [json.loads(line) for line in text.splitlines() if line.strip()]
+            except ValueError as e:
+                raise click.ClickException(f"Invalid plan: {e}")
+
+    if isinstance(document, dict) and 'steps' not in document:
+        document = [document]
+    if isinstance(document, list):
+        document = {'steps': document}
+    if not isinstance(document, dict) or not isinstance(document.get('steps'), list):
+        raise click.ClickException('Invalid plan: expected a list of steps or a mapping with "steps".')
+    return document['steps'], document.get('defaults') or {}
+
+def build_steps(steps, defaults=None):
+    """Validate plan steps and expand each one into an Operation per target."""
+    built = []
+    for number, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise click.ClickException(f"Step {number}: expected a mapping, got {step!r}.")
+        step = {**(defaults or {}), **step}
+        step_id = str(step.get('id') or f"step-{number}")
+        if any(s.id == step_id for s in built):
+            raise click.ClickException(f"Step {step_id}: duplicate step id.")
+
+        name = step.get('action')
+        action = ACTIONS.get(name)
+        if action is None:
+            raise click.ClickException(f"Step {step_id}: unknown action {name!r}; expected one of: {', '.join(ACTIONS)}.")
+        if not step.get('site-id'):
+            raise click.ClickException(f"Step {step_id}: 'site-id' is required.")
+        targets = step.get(action.target)
+        if targets is None or targets == []:
+            raise click.ClickException(f"Step {step_id}: '{action.target}' is required.")
+        if not isinstance(targets, list):
+            targets = [targets]
+
+        options = {k: v for k, v in step.items() if k not in STEP_KEYS and k != action.target}
+        unknown = set(options) - action.options - set(defaults or ())
+        if unknown:
+            raise click.ClickException(f"Step {step_id}: unknown option(s) for {name}: {', '.join(sorted(unknown))}.")
+        missing = action.required - set(options)
+        if missing:
+            raise click.ClickException(f"Step {step_id}: missing option(s) for {name}: {', '.join(sorted(missing))}.")
+        options = {k: v for k, v in options.items() if k in action.options}
+        for key, param_type in action.types.items():
+            if options.get(key) is not None:
+                try:
+                    options[key] = param_type.convert(options[key], None, None)
+                except click.BadParameter as e:
+                    raise click.ClickException(f"Step {step_id}: invalid value for '{key}': {e.message}")
+
+        after = step.get('after') or []
+        after = [str(a) for a in (after if isinstance(after, list) else [after])]
+        operations = [Operation(step_id, name, str(step['site-id']), str(target), options) for target in targets]
+        built.append(Step(step_id, after, operations))
+
+    ids = {step.id for step in built}
+    for step in built:
+        for dependency in step.after:
+            if dependency not in ids:
+                raise click.ClickException(f"Step {step.id}: 'after' refers to unknown step {dependency!r}.")
+    _check_cycles(built)
+    return built
+
+def _check_cycles(steps):
+    after = {step.id: step.after for step in steps}
+    state = {}
+
+    def visit(step_id, path):
+        if state.get(step_id) == 'done':
+            return
+        if state.get(step_id) == 'visiting':
+            raise click.ClickException(f"Steps depend on each other: {' -> '.join(path + [step_id])}.")
+        state[step_id] = 'visiting'
+        for dependency in after[step_id]:
+            visit(dependency, path + [step_id])
+        state[step_id] = 'done'
+
+    for step in steps:
+        visit(step.id, [])
+
+class Checkpoint:
+    """Keys of the operations that succeeded, appended to a file as they finish."""
+
+    def __init__(self, path=None, fresh=False):
+        self.path = path
+        self.done = set()
+        self.file = None
+        if path is None:
+            return
+        if fresh and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)['key'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        self.file = open(path, 'a')
+
+    def add(self, operation):
+        self.done.add(operation.key)
+        if self.file is not None:
+            self.file.write(dumps({'key': operation.key, 'step': operation.step, 'target': operation.target}) + '\n')
+            self.file.flush()
+
+    def close(self, complete=False):
+        """Close the file, removing it if the whole plan completed."""
+        if self.file is None:
+            return
+        self.file.close()
+        if complete:
+            os.remove(self.path)
+
+def execute(client, operation, limiter):
+    """Run one operation, returning its result record; failures are reported, not raised."""
+    limiter.wait()
+    started = time.monotonic()
+    try:
+        site_id = resolve_site(client, operation.site)
+        response = operation.action.run(client, site_id, operation.target, operation.options)
+        if response.ok:
+            result = operation.result('ok', statusCode=response.status_code)
+        else:
+            result = operation.result('failed', statusCode=response.status_code, error=format_api_error(response))
+    except ApiError as e:
+        result = operation.result('failed', statusCode=e.response.status_code, error=format_api_error(e.response))
+    except RequestException as e:
+        result = operation.result('failed', error=str(e))
+    except click.ClickException as e:
+        result = operation.result('failed', error=e.format_message())
+    result['durationMs'] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+def run_plan(client, steps, concurrency, rate=None, done=frozenset()):
+    """Run every step's operations concurrently once the steps listed in its ``after`` have finished.
+
+    Yields ``(operation, result)`` as operations finish. Operations whose key
+    is in ``done`` are skipped, as are the operations of steps that depend
+    on a step with a failure. At most ``concurrency`` operations are in
+    flight, so an interrupted run leaves nothing queued.
+    """
+    limiter = RateLimiter(rate)
+    waiting = list(steps)
+    remaining = {step.id: len(step.operations) for step in steps}
+    failed = set()
+    ready = deque()
+    running = {}
+
+    def finish(operation, result):
+        remaining[operation.step] -= 1
+        if result['status'] == 'failed' or result.get('blocked'):
+            failed.add(operation.step)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while waiting or ready or running:
+            started = [s for s in waiting if all(remaining[d] == 0 for d in s.after)]
+            for step in started:
+                waiting.remove(step)
+                blocked = [d for d in step.after if d in failed]
+                for operation in step.operations:
+                    if blocked:
+                        result = operation.result('skipped', blocked=True, reason=f"step {blocked[0]} failed")
+                    elif operation.key in done:
+                        result = operation.result('skipped', reason='completed in a previous run')
+                    else:
+                        ready.append(operation)
+                        continue
+                    finish(operation, result)
+                    yield operation, result
+
+            while ready and len(running) < concurrency:
+                operation = ready.popleft()
+                running[pool.submit(execute, client, operation, limiter)] = operation
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    operation = running.pop(future)
+                    result = future.result()
+                    finish(operation, result)
+                    yield operation, result
+            elif not started:
+                break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+@click.group()
+def batch():
+    """Run many operations from a plan file in one process."""
+    pass
+
+@batch.command('run')
+@click.argument('plan', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--concurrency', type=click.IntRange(min=1), help='Number of operations run concurrently (default: max_workers).')
+@click.option('--rate', type=click.FloatRange(min=0, min_open=True), help='Maximum operations started per second.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='File recording finished operations so that an interrupted run can resume (default: PLAN.checkpoint).')
+@click.option('--fresh', is_flag=True, help='Ignore an existing checkpoint and run every operation again.')
+@click.option('--dry-run', is_flag=True, help='Validate the plan and print its operations without running them.')
+@click.option('--yes', is_flag=True, help='Do not prompt for confirmation.')
+@pass_config
+def run_batch(config, plan, concurrency, rate, checkpoint, fresh, dry_run, yes):
+    """Run the steps of a YAML, JSON or NDJSON plan and print one NDJSON result per operation.
+
+    Each step names an action (e.g. "clients block"), a site-id, the target
+    option of that action (a single value or a list) and any of its other
+    options; "after" lists the steps that must finish first. Steps without
+    dependencies between them run concurrently over one connection pool.
+
+    Finished operations are recorded in the checkpoint file; running the
+    same plan again after an interruption or failure skips them. The
+    checkpoint is removed once every operation has succeeded.
+    """
+    steps = build_steps(*load_plan(plan))
+    operations = sum(len(step.operations) for step in steps)
+    if dry_run:
+        for step in steps:
+            for operation in step.operations:
+                click.echo(dumps(operation.result('planned', after=step.after, options=operation.options)))
+        return
+
+    if checkpoint is None and plan != '-':
+        checkpoint = f"{plan}.checkpoint"
+    state = Checkpoint(checkpoint, fresh=fresh)
+    pending = operations - sum(1 for step in steps for operation in step.operations if operation.key in state.done)
+    if state.done and pending < operations:
+        click.echo(f"Resuming from {checkpoint}: {operations - pending} of {operations} operations already done.", err=True)
+    if not yes:
+        if plan == '-':
+            raise click.UsageError('--yes is required when reading the plan from stdin.')
+        click.confirm(f"Run {pending} operations in {len(steps)} steps?", abort=True)
+
+    counts = {'ok': 0, 'failed': 0, 'skipped': 0}
+    try:
+        for operation, result in run_plan(config.client, steps, concurrency or config.max_workers, rate, state.done):
+            if result['status'] == 'ok':
+                state.add(operation)
+            if result['status'] == 'skipped' and not result.get('blocked'):
+                counts['ok'] += 1
+            else:
+                counts[result['status']] += 1
+            click.echo(dumps(result))
+    finally:
+        state.close(complete=counts['ok'] == operations)
+
+    click.echo(f"{counts['ok']} succeeded, {counts['failed']} failed, {counts['skipped']} skipped.", err=True)
+    if counts['failed'] or counts['skipped']:
+        click.get_current_context().exit(1)
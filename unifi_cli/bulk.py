@@ -0,0 +1,49 @@
+import click
+from .api import ordered_map, RequestException
+from .util import format_api_error
+from .throttle import RateLimiter
+
+class BulkResult:
+    def __init__(self, target, ok, error=None):
+        self.target = target
+        self.ok = ok
+        self.error = error
+
+def run_bulk(action, targets, concurrency, rate=None):
+    """Run ``action(target)`` for every target concurrently, yielding a BulkResult per target in order.
+
+    ``action`` returns a requests response; non-2xx responses and connection
+    errors are reported as failures rather than raised.
+    """
+    limiter = RateLimiter(rate)
+
+    def run(target):
+        limiter.wait()
+        try:
+            response = action(target)
+        except RequestException as e:
+            return BulkResult(target, False, str(e))
+        if not response.ok:
+            return BulkResult(target, False, format_api_error(response))
+        return BulkResult(target, True)
+
+    return ordered_map(run, targets, concurrency)
+
+def read_targets(file):
+    """Read one target per line from an open file, skipping blanks and ``#`` comments."""
+    for line in file:
+        line = line.split('#', 1)[0].strip()
+        if line:
+            yield line
+
+def echo_result(result, label):
+    if result.ok:
+        click.echo(f"OK      {label}")
+    else:
+        click.echo(f"FAILED  {label}: {result.error}")
+
+def echo_summary(results):
+    """Print a success/failure count and return the number of failures."""
+    failed = sum(1 for r in results if not r.ok)
+    click.echo(f"{len(results) - failed} succeeded, {failed} failed.", err=True)
+    return failed
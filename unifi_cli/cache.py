@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+# Seconds a cached GET response stays fresh, keyed by resource type.
+# A TTL of 0 disables caching for that resource.
+DEFAULT_TTLS = {
+    'info': 3600,
+    'sites': 300,
+    'devices': 60,
+    'statistics': 0,
+    'clients': 30,
+    'vouchers': 30,
+}
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SITE_PATTERN = re.compile(r'^(?:/sites|/api/s)/([^/]+)')
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'unifi-cli'
+
+def resource_type(path):
+    """Classify an API path into one of the resource types in DEFAULT_TTLS."""
+    if path.endswith('/statistics/latest'):
+        return 'statistics'
+    if '/hotspot/vouchers' in path:
+        return 'vouchers'
+    if '/clients' in path:
+        return 'clients'
+    if '/devices' in path:
+        return 'devices'
+    if path.startswith('/sites'):
+        return 'sites'
+    if path == '/info':
+        return 'info'
+    return None
+
+def site_of(path):
+    """Return the site ID a path belongs to, or None for controller-wide paths."""
+    match = _SITE_PATTERN.match(path)
+    return match.group(1) if match else None
+
+class ResponseCache:
+    """An on-disk, size-bounded LRU cache of decoded GET responses, backed by SQLite.
+
+    Entries are keyed by controller, credentials, path and query parameters and
+    expire after a per-resource TTL.
+    """
+
+    def __init__(self, path=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        path = Path(path) if path else default_cache_dir() / 'cache.sqlite'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY, controller TEXT, site TEXT, body BLOB,'
+            ' expires_at REAL, accessed_at REAL, size INTEGER)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_site ON responses (controller, site)')
+        # The total size of all entries, kept up to date by triggers so that an
+        # insert does not have to sum the whole table to decide whether to evict.
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            self._db.execute('CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)')
+            self._db.execute(
+                'CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN'
+                ' UPDATE cache_size SET total = total + NEW.size; END'
+            )
+            self._db.execute(
+                'CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN'
+                ' UPDATE cache_size SET total = total - OLD.size + NEW.size; END'
+            )
+            self._db.execute(
+                'CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN'
+                ' UPDATE cache_size SET total = total - OLD.size; END'
+            )
+            self._db.execute(
+                'INSERT OR IGNORE INTO cache_size VALUES (0, (SELECT COALESCE(SUM(size), 0) FROM responses))'
+            )
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    @staticmethod
+    def make_key(controller, credentials, path, params=None):
+        params = sorted((params or {}).items())
+        raw = json.dumps([controller, credentials, path, params], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def ttl_for(self, path):
+        return self.ttls.get(resource_type(path), 0)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                'SELECT body FROM responses WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, controller, path, body):
+        ttl = self.ttl_for(path)
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the rows REPLACE deletes
+            # do not fire delete triggers, which would skew the running total.
+            self._db.execute(
+                'INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET'
+                ' controller = excluded.controller, site = excluded.site, body = excluded.body,'
+                ' expires_at = excluded.expires_at, accessed_at = excluded.accessed_at, size = excluded.size',
+                (key, controller, site_of(path), body, now + ttl, now, len(body))
+            )
+            self._evict()
+
+    def size(self):
+        """The total size in bytes of the cached bodies."""
+        return self._db.execute('SELECT total FROM cache_size').fetchone()[0]
+
+    def _evict(self):
+        if self.size() <= self.max_bytes:
+            return
+        self._db.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+        rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at DESC').fetchall()
+        kept = 0
+        stale = []
+        for key, size in rows:
+            kept += size
+            if kept > self.max_bytes:
+                stale.append((key,))
+        self._db.executemany('DELETE FROM responses WHERE key = ?', stale)
+
+    def invalidate(self, controller, path):
+        """Drop every cached response for the site ``path`` belongs to."""
+        site = site_of(path)
+        with self._lock:
+            if site is None:
+                self._db.execute('DELETE FROM responses WHERE controller = ?', (controller,))
+            else:
+                self._db.execute('DELETE FROM responses WHERE controller = ? AND site = ?', (controller, site))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
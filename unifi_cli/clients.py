@@ -1,8 +1,42 @@
 import click
-import requests
 import json
 from .config import pass_config
-from .util import handle_api_error, print_json_output
+from .api import ApiError, RequestException
+from .util import handle_api_error, print_json_output, parse_columns, OUTPUT_FORMATS
+from .fleet import print_site_list
+from .index import resolve_site, resolve_client, resolve_client_mac
+
+def authorize(client, site_id, client_id, time_limit=None, data_usage_limit=None, rx_rate_limit=None,
+              tx_rate_limit=None):
+    """Ask the controller to authorize a client as a guest and return the response."""
+    data = {
+        'action': 'AUTHORIZE_GUEST_ACCESS'
+    }
+    if time_limit is not None:
+        data['timeLimitMinutes'] = time_limit
+    if data_usage_limit is not None:
+        data['dataUsageLimitMBytes'] = data_usage_limit
+    if rx_rate_limit is not None:
+        data['rxRateLimitKbps'] = rx_rate_limit
+    if tx_rate_limit is not None:
+        data['txRateLimitKbps'] = tx_rate_limit
+    return client.post(f"/sites/{site_id}/clients/{client_id}/actions", json=data)
+
+def block(client, site_id, mac_address):
+    """Ask the controller to block a client by MAC address and return the response."""
+    data = {
+        'cmd': 'block-sta',
+        'mac': mac_address
+    }
+    return client.post(f"/api/s/{site_id}/cmd/stamgr", json=data)
+
+def unblock(client, site_id, mac_address):
+    """Ask the controller to unblock a client by MAC address and return the response."""
+    data = {
+        'cmd': 'unblock-sta',
+        'mac': mac_address
+    }
+    return client.post(f"/api/s/{site_id}/cmd/stamgr", json=data)
 
 @click.group()
 def clients():
@@ -10,19 +44,20 @@ def clients():
     pass
 
 @clients.command('list')
-@click.option('--site-id', required=True, help='The ID of the site to list clients for.')
+@click.option('--site-id', help='The ID of the site, or a comma-separated list or glob of site IDs/names.')
+@click.option('--all-sites', is_flag=True, help='List clients across every site.')
+@click.option('--concurrency', type=int, help='Number of sites queried concurrently (default: max_workers).')
 @click.option('--filter', help='Filter the results.')
 @click.option('--offset', type=int, default=0, help='Offset for pagination.')
 @click.option('--limit', type=int, default=25, help='Limit for pagination (max 200).')
+@click.option('--all', 'fetch_all', is_flag=True, help='Fetch every page concurrently and merge the results (ignores --limit).')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), default='json', help='Output format; ndjson, table, csv and tsv stream one record per line.')
+@click.option('--columns', help='Comma-separated fields (e.g. id,name,uplink.txRateBps) for table, csv and tsv output.')
 @pass_config
-def list_clients(config, site_id, filter, offset, limit, json, query):
+def list_clients(config, site_id, all_sites, concurrency, filter, offset, limit, fetch_all, json, query, output_format, columns):
     """List all connected clients for a site."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     params = {
         'offset': offset,
         'limit': limit
@@ -31,40 +66,35 @@ def list_clients(config, site_id, filter, offset, limit, json, query):
         params['filter'] = filter
 
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/clients", headers=headers, params=params, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
-        print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+        print_site_list(config.client, site_id, all_sites, "/sites/{site_id}/clients", params, page_size=200,
+                        fetch_all=fetch_all, concurrency=concurrency, raw_json=json, query=query,
+                        output_format=output_format, columns=parse_columns(columns))
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @clients.command('get')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--client-id', required=True, help='The ID of the client.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--client-id', required=True, help='The ID, MAC, hostname or IP address of the client.')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
 @pass_config
 def get_client(config, site_id, client_id, json, query):
     """Get detailed information about a specific client."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/clients/{client_id}", headers=headers, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
+        site_id = resolve_site(config.client, site_id)
+        client_id = resolve_client(config.client, site_id, client_id)
+        data = config.client.get_json(f"/sites/{site_id}/clients/{client_id}")
         print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @clients.command('authorize-guest')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--client-id', required=True, help='The ID of the client to authorize.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--client-id', required=True, help='The ID, MAC, hostname or IP address of the client to authorize.')
 @click.option('--time-limit', type=int, help='How long (in minutes) the guest will be authorized.')
 @click.option('--data-usage-limit', type=int, help='Data usage limit in megabytes.')
 @click.option('--rx-rate-limit', type=int, help='Download rate limit in kilobits per second.')
@@ -72,75 +102,56 @@ def get_client(config, site_id, client_id, json, query):
 @pass_config
 def authorize_guest(config, site_id, client_id, time_limit, data_usage_limit, rx_rate_limit, tx_rate_limit):
     """Authorize a specific client as a guest."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
-    data = {
-        'action': 'AUTHORIZE_GUEST_ACCESS'
-    }
-    if time_limit is not None:
-        data['timeLimitMinutes'] = time_limit
-    if data_usage_limit is not None:
-        data['dataUsageLimitMBytes'] = data_usage_limit
-    if rx_rate_limit is not None:
-        data['rxRateLimitKbps'] = rx_rate_limit
-    if tx_rate_limit is not None:
-        data['txRateLimitKbps'] = tx_rate_limit
-
     try:
-        response = requests.post(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/clients/{client_id}/actions", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        client_id = resolve_client(config.client, site_id, client_id, verify=True)
+        response = authorize(config.client, site_id, client_id, time_limit, data_usage_limit, rx_rate_limit,
+                             tx_rate_limit)
         if not response.ok:
             handle_api_error(response)
             return
         click.echo(f"Client {client_id} guest authorization initiated.")
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @clients.command('block')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--mac-address', required=True, help='The MAC address of the client to block.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--mac-address', required=True, help='The MAC address (or hostname or IP address) of the client to block.')
 @click.confirmation_option(prompt='Are you sure you want to block this client?')
 @pass_config
 def block_client(config, site_id, mac_address):
     """Block a specific client by MAC address."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
-    data = {
-        'cmd': 'block-sta',
-        'mac': mac_address.lower()
-    }
     try:
-        response = requests.post(f"{config.url}/api/s/{site_id}/cmd/stamgr", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        mac_address = resolve_client_mac(config.client, site_id, mac_address, verify=True)
+        response = block(config.client, site_id, mac_address)
         if not response.ok:
             handle_api_error(response)
             return
         click.echo(f"Client {mac_address} blocked.")
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @clients.command('unblock')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--mac-address', required=True, help='The MAC address of the client to unblock.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--mac-address', required=True, help='The MAC address (or hostname or IP address) of the client to unblock.')
 @click.confirmation_option(prompt='Are you sure you want to unblock this client?')
 @pass_config
 def unblock_client(config, site_id, mac_address):
     """Unblock a specific client by MAC address."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
-    data = {
-        'cmd': 'unblock-sta',
-        'mac': mac_address.lower()
-    }
     try:
-        response = requests.post(f"{config.url}/api/s/{site_id}/cmd/stamgr", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        mac_address = resolve_client_mac(config.client, site_id, mac_address, verify=True)
+        response = unblock(config.client, site_id, mac_address)
         if not response.ok:
             handle_api_error(response)
             return
         click.echo(f"Client {mac_address} unblocked.")
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
\ No newline at end of file
@@ -1,26 +1,144 @@
 import os
+import copy
 import click
 import json
 from pathlib import Path
 
+def as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+    return bool(value)
+
+def load_config_file():
+    """Return the contents of ``~/.unifi_cli.json``, or an empty dict if there is none."""
+    config_file = Path.home() / '.unifi_cli.json'
+    if not config_file.exists():
+        return {}
+    with open(config_file) as f:
+        return json.load(f)
+
 class Config:
-    def __init__(self):
-        self.url = os.environ.get('UNIFI_URL')
-        self.api_key = os.environ.get('UNIFI_API_KEY')
-
-        config_file = Path.home() / '.unifi_cli.json'
-        if config_file.exists():
-            with open(config_file) as f:
-                config_data = json.load(f)
-            if not self.url:
-                self.url = config_data.get('url')
-            if not self.api_key:
-                self.api_key = config_data.get('api_key')
+    """Settings for one controller.
+
+    ``controller`` names a profile under ``controllers`` in the config file;
+    its keys override the top-level ones. Without it, ``default_controller``
+    is used unless ``UNIFI_URL`` is set, and otherwise the top-level (or
+    environment) ``url`` and ``api_key``.
+    """
+
+    def __init__(self, controller=None):
+        config_data = load_config_file()
+        profiles = config_data.get('controllers', {})
+        if controller is None and not os.environ.get('UNIFI_URL'):
+            controller = config_data.get('default_controller')
+        self.controller = controller
+
+        if controller:
+            if controller not in profiles:
+                raise click.UsageError(
+                    f"Unknown controller '{controller}'. "
+                    f"Configured controllers: {', '.join(profiles) or 'none'}."
+                )
+            config_data = {**config_data, **profiles[controller]}
+            self.url = config_data.get('url')
+            self.api_key = config_data.get('api_key')
+        else:
+            self.url = os.environ.get('UNIFI_URL') or config_data.get('url')
+            self.api_key = os.environ.get('UNIFI_API_KEY') or config_data.get('api_key')
 
         if not self.url or not self.api_key:
+            if controller:
+                raise click.UsageError(f"Controller '{controller}' needs both \"url\" and \"api_key\".")
             raise click.UsageError(
                 'UniFi URL and API key must be configured. \n'
                 'Set UNIFI_URL and UNIFI_API_KEY environment variables, or create a .unifi_cli.json file in your home directory with "url" and "api_key" keys.'
             )
 
+        def setting(key, default, cast):
+            value = os.environ.get(f'UNIFI_{key.upper()}', config_data.get(key, default))
+            return cast(value)
+
+        self.pool_size = setting('pool_size', 10, int)
+        self.timeout = setting('timeout', 30.0, float)
+        self.connect_timeout = setting('connect_timeout', 5.0, float)
+        self.retries = setting('retries', 3, int)
+        self.backoff = setting('backoff', 0.5, float)
+        self.max_workers = setting('max_workers', 8, int)
+        self.rate_limit = setting('rate_limit', 0, float)
+        self.burst = setting('burst', 10, int)
+        self.adaptive_concurrency = setting('adaptive_concurrency', False, as_bool)
+
+        self.use_cache = setting('cache', True, as_bool)
+        self.refresh_cache = False
+        self.cache_dir = config_data.get('cache_dir')
+        self.cache_max_bytes = setting('cache_max_bytes', 64 * 1024 * 1024, int)
+        self.cache_ttl = config_data.get('cache_ttl', {})
+        self.use_index = setting('index', True, as_bool)
+        self.index_ttl = setting('index_ttl', 24 * 3600, int)
+        self.stats_dir = config_data.get('stats_dir')
+        self.snapshot_dir = config_data.get('snapshot_dir')
+
+        self._client = None
+        self._cache = None
+        self._index = None
+        self._throttle = None
+        self._parent = None
+
+    def fork(self):
+        """Return a per-invocation copy that shares this config's connection pool, cache and index.
+
+        Used by the daemon so that each forwarded command can set its own
+        options (e.g. ``--no-cache``) without affecting the warm state.
+        """
+        forked = copy.copy(self)
+        forked._client = None
+        forked._parent = self
+        return forked
+
+    @property
+    def cache(self):
+        """The on-disk response cache, or None when caching is disabled."""
+        if not self.use_cache:
+            return None
+        if self._cache is None:
+            from .cache import ResponseCache
+            path = Path(self.cache_dir) / 'cache.sqlite' if self.cache_dir else None
+            self._cache = ResponseCache(path, ttls=self.cache_ttl, max_bytes=self.cache_max_bytes)
+        return self._cache
+
+    @property
+    def index(self):
+        """The persistent name/MAC/IP-to-ID index, or None when disabled."""
+        if not self.use_index:
+            return None
+        if self._index is None:
+            from .index import IdentifierIndex
+            path = Path(self.cache_dir) / 'index.sqlite' if self.cache_dir else None
+            self._index = IdentifierIndex(path, ttl=self.index_ttl)
+        return self._index
+
+    @property
+    def throttle(self):
+        """The rate limiter/adaptive concurrency controller shared by all processes, or None when disabled."""
+        if not self.rate_limit and not self.adaptive_concurrency:
+            return None
+        if self._throttle is None:
+            from .throttle import Throttle
+            state_dir = Path(self.cache_dir) / 'throttle' if self.cache_dir else None
+            self._throttle = Throttle(self.url, rate=self.rate_limit, burst=self.burst,
+                                      max_concurrency=self.pool_size, adaptive=self.adaptive_concurrency,
+                                      state_dir=state_dir)
+        return self._throttle
+
+    @property
+    def client(self):
+        """The shared, pooled HTTP client for the configured controller."""
+        if self._client is None:
+            if self._parent is not None:
+                self._client = self._parent.client.derive(cache=self.cache, refresh=self.refresh_cache)
+            else:
+                from .api import UnifiClient
+                self._client = UnifiClient.from_config(self)
+        return self._client
+
 pass_config = click.make_pass_decorator(Config, ensure=True)
@@ -0,0 +1,214 @@
+import io
+import sys
+import json
+import threading
+import traceback
+import click
+from fnmatch import fnmatchcase
+from .api import ordered_map
+from .remote import command_path
+from .util import RecordPrinter, print_json_output, parse_columns
+
+# Commands that only read from the controller, and so may run against several
+# controllers at once with --controller.
+READ_COMMANDS = {
+    ('info',),
+    ('sites', 'list'),
+    ('devices', 'list'),
+    ('devices', 'get'),
+    ('devices', 'get-latest-statistics'),
+    ('clients', 'list'),
+    ('clients', 'get'),
+    ('hotspot', 'vouchers', 'list'),
+    ('hotspot', 'vouchers', 'get'),
+    ('sync',),
+}
+
+# Read commands that always print NDJSON records rather than one JSON document.
+NDJSON_COMMANDS = {
+    ('sync',),
+}
+
+def select_controllers(profiles, selector):
+    """Return the profile names matching ``all`` or a comma-separated list of names or globs."""
+    if selector.strip() == 'all':
+        if not profiles:
+            raise click.UsageError('No controllers are configured under "controllers" in ~/.unifi_cli.json.')
+        return list(profiles)
+    names = []
+    for pattern in (p.strip() for p in selector.split(',') if p.strip()):
+        matches = [name for name in profiles if fnmatchcase(name, pattern)]
+        if not matches:
+            raise click.UsageError(
+                f"Unknown controller '{pattern}'. Configured controllers: {', '.join(profiles) or 'none'}."
+            )
+        names.extend(name for name in matches if name not in names)
+    return names
+
+def pop_option(args, name):
+    """Remove ``name value`` (or ``name=value``) from ``args`` and return the value, or None."""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + '='):
+            del args[i]
+            return arg.split('=', 1)[1]
+    return None
+
+def tag(record, controller):
+    if isinstance(record, dict):
+        return {'controller': controller, **record}
+    return {'controller': controller, 'result': record}
+
+class ThreadOutput(io.TextIOBase):
+    """A text stream that writes to the current thread's buffer, if it has one, or else to ``fallback``.
+
+    Installed as ``sys.stdout``/``sys.stderr`` while commands run in worker
+    threads, so that each controller's output can be captured separately.
+    """
+
+    encoding = 'utf-8'
+    errors = 'strict'
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.fallback if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.fallback.flush()
+
+class ControllerCommand(click.Command):
+    """Runs a read command once per controller, concurrently, and merges the results.
+
+    Every record is tagged with a ``controller`` field. Documents printed as
+    JSON are combined into one ``data`` list; record formats (``--format
+    ndjson|table|csv|tsv``) and NDJSON output are written controller by
+    controller as results arrive. Which of the two applies is decided by the
+    command and ``--format``, never by what the output looks like.
+    ``--query`` is passed through, so it applies to each controller's
+    output before merging. A controller that fails is reported on stderr
+    without aborting the others.
+    """
+
+    def __init__(self, name, command):
+        super().__init__(name, add_help_option=False,
+                         context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+        self.command = command
+
+    def invoke(self, ctx):
+        configs = ctx.meta['unifi.controllers']
+        args = list(ctx.args)
+        path = command_path([self.name] + args)
+        if path not in READ_COMMANDS:
+            raise click.UsageError(f"'unifi {' '.join(path)}' can only run against one controller at a time.")
+
+        output_format = pop_option(args, '--format') or 'json'
+        columns = parse_columns(pop_option(args, '--columns'))
+        raw_json = '--json' in args
+        if output_format != 'json':
+            args += ['--format', 'ndjson']
+            if columns and 'controller' not in columns:
+                columns = ['controller'] + columns
+        printer = RecordPrinter(output_format, columns=columns) if output_format != 'json' else None
+        if printer is None and path in NDJSON_COMMANDS:
+            printer = RecordPrinter('ndjson')
+
+        streams = ThreadOutput(sys.stdout), ThreadOutput(sys.stderr)
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = streams
+        try:
+            results = list(self.merge(ordered_map(lambda config: self.run(config, args, streams),
+                                                  configs, len(configs)), printer))
+        finally:
+            sys.stdout, sys.stderr = saved
+
+        if printer is not None:
+            printer.finish()
+            documents = []
+        else:
+            documents = [(name, document) for name, document in results if document is not None]
+        if documents:
+            data, total, merged = [], 0, True
+            for name, document in documents:
+                if isinstance(document, dict) and isinstance(document.get('data'), list):
+                    data.extend(tag(record, name) for record in document['data'])
+                    total += document.get('totalCount', len(document['data']))
+                elif isinstance(document, list):
+                    data.extend(tag(record, name) for record in document)
+                    merged = False
+                else:
+                    data.append(tag(document, name))
+                    merged = False
+            output = {'count': len(data), 'controllers': len(configs), 'data': data}
+            if merged:
+                output['totalCount'] = total
+            print_json_output(output, raw_json=raw_json)
+
+        if any(name is None for name, _ in results):
+            ctx.exit(1)
+
+    def run(self, config, args, streams):
+        """Run the command against one controller, returning its exit code, stdout and stderr."""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        streams[0].local.buffer, streams[1].local.buffer = stdout, stderr
+        try:
+            code = self.command.main(args, prog_name=f'unifi {self.name}', obj=config, standalone_mode=False)
+            code = code if isinstance(code, int) else 0
+        except click.ClickException as e:
+            e.show()
+            code = e.exit_code
+        except click.Abort:
+            click.echo('Aborted!', err=True)
+            code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            streams[0].local.buffer = streams[1].local.buffer = None
+        return config.controller, code, stdout.getvalue(), stderr.getvalue()
+
+    def merge(self, results, printer):
+        """Report each controller's errors and yield ``(name, document)`` for the JSON documents it printed.
+
+        With a ``printer``, each controller's output is read as NDJSON records
+        and written straight to it. A controller that exited with an error, or that printed
+        only errors, counts as failed and yields ``(None, None)``.
+        """
+        for name, code, stdout, stderr in results:
+            lines = stderr.splitlines()
+            if code or (lines and not stdout.strip()):
+                click.echo(f"Controller {name} failed:", err=True)
+                click.echo('\n'.join(f"  {line}" for line in lines) or f"  Exit status {code}", err=True)
+                yield None, None
+                continue
+            for line in lines:
+                click.echo(f"{name}: {line}", err=True)
+            if not stdout.strip():
+                continue
+            try:
+                if printer is None:
+                    document = json.loads(stdout)
+                else:
+                    records = [json.loads(line) for line in stdout.splitlines() if line.strip()]
+            except ValueError:
+                click.echo('\n'.join(f"{name}: {line}" for line in stdout.splitlines()))
+                continue
+            if printer is None:
+                yield name, document
+            else:
+                printer.write([tag(record, name) for record in records])
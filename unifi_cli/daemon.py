@@ -0,0 +1,243 @@
+import io
+import os
+import sys
+import json
+import time
+import threading
+import traceback
+import subprocess
+import socketserver
+import click
+from click.core import ParameterSource
+from .config import Config
+from .remote import socket_path, fingerprint, send_frame, recv_frame, connect
+
+# Long-running commands that always run in the caller's process: the daemon
+# serves one command at a time, so these would hold up every other caller.
+LOCAL_COMMANDS = [
+    ('daemon',),
+    ('serve-metrics',),
+    ('devices', 'watch'),
+    ('devices', 'bulk-restart'),
+    ('devices', 'bulk-power-cycle-port'),
+    ('hotspot', 'vouchers', 'generate-bulk'),
+    ('hotspot', 'vouchers', 'export'),
+    ('hotspot', 'vouchers', 'purge'),
+    ('stats', 'record'),
+    ('sync',),
+    ('batch',),
+]
+
+def runs_locally(argv):
+    """Whether ``argv`` must run in the caller's process: it names one of
+    LOCAL_COMMANDS, or it would prompt (e.g. a confirmation without
+    ``--yes``), whose answer has to come from the caller's own stdin."""
+    from .main import resolve_argv
+    try:
+        path, command, ctx = resolve_argv(argv)
+    except click.ClickException:
+        # Let the command itself report the usage error.
+        return False
+    if any(path[:len(local)] == local for local in LOCAL_COMMANDS):
+        return True
+    return any(
+        isinstance(param, click.Option) and param.prompt
+        and ctx.get_parameter_source(param.name) in (None, ParameterSource.DEFAULT)
+        for param in command.params
+    )
+
+class FrameStream(io.TextIOBase):
+    """A text stream that relays everything written to it as frames on the client's socket."""
+
+    encoding = 'utf-8'
+    errors = 'strict'
+
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if text:
+            send_frame(self.sock, self.kind, text.encode(self.encoding))
+        return len(text)
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Runs forwarded invocations one at a time against a warm Config.
+
+    Requests are handled sequentially because each one temporarily takes
+    over the process's working directory and standard streams.
+    """
+
+    def __init__(self, path, config):
+        self.config = config
+        self.fingerprint = fingerprint()
+        self.started = time.time()
+        self.served = 0
+        super().__init__(str(path), DaemonHandler)
+
+class DaemonHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        try:
+            _, payload = recv_frame(sock)
+        except ConnectionError:
+            return
+        request = json.loads(payload)
+
+        control = request.get('control')
+        if control == 'status':
+            status = {
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.server.started, 1),
+                'served': self.server.served,
+                'url': self.server.config.url,
+            }
+            send_frame(sock, b'O', (json.dumps(status) + '\n').encode())
+            send_frame(sock, b'X', b'0')
+            return
+        if control == 'stop':
+            send_frame(sock, b'X', b'0')
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        if request.get('fingerprint') != self.server.fingerprint:
+            send_frame(sock, b'R')
+            return
+
+        if runs_locally(request['argv']):
+            send_frame(sock, b'L')
+            return
+        stdin = ''
+        if request.get('stdin'):
+            # The command reads a '-' argument: ask the client for its input.
+            send_frame(sock, b'I')
+            try:
+                _, payload = recv_frame(sock)
+            except ConnectionError:
+                return
+            stdin = payload.decode()
+
+        send_frame(sock, b'X', str(self.run(request, sock, stdin)).encode())
+        self.server.served += 1
+
+    def run(self, request, sock, stdin=''):
+        from .main import cli
+
+        saved = sys.stdin, sys.stdout, sys.stderr, os.getcwd()
+        sys.stdin = io.StringIO(stdin)
+        sys.stdout = FrameStream(sock, b'O')
+        sys.stderr = FrameStream(sock, b'E')
+        try:
+            os.chdir(request['cwd'])
+            cli.main(args=request['argv'], prog_name='unifi', obj=self.server.config.fork())
+            return 0
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            return e.code if isinstance(e.code, int) else 1
+        except BrokenPipeError:
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr, cwd = saved
+            os.chdir(cwd)
+
+def serve(path=None):
+    """Run the daemon in the foreground until it is stopped."""
+    path = path or socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        sock = connect(path)
+        if sock is not None:
+            sock.close()
+            raise click.ClickException(f"A daemon is already listening on {path}.")
+        path.unlink()
+
+    config = Config()
+    server = DaemonServer(path, config)
+    os.chmod(path, 0o600)
+    click.echo(f"unifi daemon listening on {path} (pid {os.getpid()})", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if path.exists():
+            path.unlink()
+
+def control(command):
+    """Send a control request to the daemon, returning its output, or None if none is running."""
+    sock = connect()
+    if sock is None:
+        return None
+    output = []
+    with sock:
+        send_frame(sock, b'Q', json.dumps({'control': command}).encode())
+        while True:
+            kind, payload = recv_frame(sock)
+            if kind == b'O':
+                output.append(payload.decode())
+            elif kind == b'X':
+                return ''.join(output)
+
+@click.group()
+def daemon():
+    """Manage the background daemon that keeps config, connections and caches warm."""
+    pass
+
+@daemon.command('run')
+def run_daemon():
+    """Run the daemon in the foreground."""
+    serve()
+
+@daemon.command('start')
+@click.option('--timeout', type=float, default=10, help='Seconds to wait for the daemon to come up.')
+def start_daemon(timeout):
+    """Start the daemon in the background."""
+    if control('status') is not None:
+        click.echo("The daemon is already running.")
+        return
+    Config()
+    path = socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    log = open(path.with_suffix('.log'), 'a')
+    subprocess.Popen(
+        [sys.executable, '-c', 'from unifi_cli.main import cli; cli()', 'daemon', 'run'],
+        stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = control('status')
+        if status is not None:
+            click.echo(f"Daemon started: {status.strip()}")
+            return
+        time.sleep(0.1)
+    raise click.ClickException(f"The daemon did not start; see {log.name}.")
+
+@daemon.command('stop')
+def stop_daemon():
+    """Stop the background daemon."""
+    if control('stop') is None:
+        click.echo("The daemon is not running.")
+        return
+    click.echo("Daemon stopped.")
+
+@daemon.command('status')
+def daemon_status():
+    """Show whether the daemon is running."""
+    status = control('status')
+    if status is None:
+        click.echo("The daemon is not running.")
+        return
+    click.echo(status.strip())
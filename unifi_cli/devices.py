@@ -1,8 +1,28 @@
+import time
 import click
-import requests
-import json
 from .config import pass_config
-from .util import handle_api_error, print_json_output
+from .api import ApiError, RequestException, ordered_map
+from .bulk import run_bulk, read_targets, echo_result, echo_summary
+from .util import dumps, handle_api_error, print_json_output, parse_columns, OUTPUT_FORMATS
+from .fleet import print_site_list
+from .index import resolve_site, resolve_device
+from .watch import Threshold, watch
+
+RESTART_GRACE_SECONDS = 15
+
+def restart(client, site_id, device_id):
+    """Ask the controller to restart a device and return the response."""
+    data = {
+        'action': 'RESTART'
+    }
+    return client.post(f"/sites/{site_id}/devices/{device_id}/actions", json=data)
+
+def power_cycle(client, site_id, device_id, port_idx):
+    """Ask the controller to power cycle a port on a device and return the response."""
+    data = {
+        'action': 'POWER_CYCLE'
+    }
+    return client.post(f"/sites/{site_id}/devices/{device_id}/interfaces/ports/{port_idx}/actions", json=data)
 
 @click.group()
 def devices():
@@ -10,19 +30,20 @@ def devices():
     pass
 
 @devices.command('list')
-@click.option('--site-id', required=True, help='The ID of the site to list devices for.')
+@click.option('--site-id', help='The ID of the site, or a comma-separated list or glob of site IDs/names.')
+@click.option('--all-sites', is_flag=True, help='List devices across every site.')
+@click.option('--concurrency', type=int, help='Number of sites queried concurrently (default: max_workers).')
 @click.option('--filter', help='Filter the results.')
 @click.option('--offset', type=int, default=0, help='Offset for pagination.')
 @click.option('--limit', type=int, default=25, help='Limit for pagination (max 200).')
+@click.option('--all', 'fetch_all', is_flag=True, help='Fetch every page concurrently and merge the results (ignores --limit).')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), default='json', help='Output format; ndjson, table, csv and tsv stream one record per line.')
+@click.option('--columns', help='Comma-separated fields (e.g. id,name,uplink.txRateBps) for table, csv and tsv output.')
 @pass_config
-def list_devices(config, site_id, filter, offset, limit, json, query):
+def list_devices(config, site_id, all_sites, concurrency, filter, offset, limit, fetch_all, json, query, output_format, columns):
     """List all devices for a site."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     params = {
         'offset': offset,
         'limit': limit
@@ -31,102 +52,271 @@ def list_devices(config, site_id, filter, offset, limit, json, query):
         params['filter'] = filter
 
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/devices", headers=headers, params=params, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
-        print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+        print_site_list(config.client, site_id, all_sites, "/sites/{site_id}/devices", params, page_size=200,
+                        fetch_all=fetch_all, concurrency=concurrency, raw_json=json, query=query,
+                        output_format=output_format, columns=parse_columns(columns))
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @devices.command('get')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--device-id', required=True, help='The ID of the device.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', required=True, help='The ID, name, MAC or IP address of the device.')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
 @pass_config
 def get_device(config, site_id, device_id, json, query):
     """Get detailed information about a specific device."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/devices/{device_id}", headers=headers, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
+        site_id = resolve_site(config.client, site_id)
+        device_id = resolve_device(config.client, site_id, device_id)
+        data = config.client.get_json(f"/sites/{site_id}/devices/{device_id}")
         print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @devices.command('restart')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--device-id', required=True, help='The ID of the device to restart.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', required=True, help='The ID, name, MAC or IP address of the device to restart.')
 @click.confirmation_option(prompt='Are you sure you want to restart this device?')
 @pass_config
 def restart_device(config, site_id, device_id):
     """Restart a specific device."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
-    data = {
-        'action': 'RESTART'
-    }
     try:
-        response = requests.post(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/devices/{device_id}/actions", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        device_id = resolve_device(config.client, site_id, device_id, verify=True)
+        response = restart(config.client, site_id, device_id)
         if not response.ok:
             handle_api_error(response)
             return
         click.echo(f"Device {device_id} restart initiated.")
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @devices.command('power-cycle-port')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--device-id', required=True, help='The ID of the device.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', required=True, help='The ID, name, MAC or IP address of the device.')
 @click.option('--port-idx', required=True, type=int, help='The index of the port to power cycle.')
 @click.confirmation_option(prompt='Are you sure you want to power cycle this port?')
 @pass_config
 def power_cycle_port(config, site_id, device_id, port_idx):
     """Power cycle a specific port on a device."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
-    data = {
-        'action': 'POWER_CYCLE'
-    }
     try:
-        response = requests.post(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/devices/{device_id}/interfaces/ports/{port_idx}/actions", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        device_id = resolve_device(config.client, site_id, device_id, verify=True)
+        response = power_cycle(config.client, site_id, device_id, port_idx)
         if not response.ok:
             handle_api_error(response)
             return
         click.echo(f"Port {port_idx} on device {device_id} power cycle initiated.")
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @devices.command('get-latest-statistics')
-@click.option('--site-id', required=True, help='The ID of the site.')
-@click.option('--device-id', required=True, help='The ID of the device.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', required=True, help='The ID, name, MAC or IP address of the device.')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
 @pass_config
 def get_latest_statistics(config, site_id, device_id, json, query):
     """Retrieve the latest real-time statistics of a specific adopted device."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/devices/{device_id}/statistics/latest", headers=headers, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
+        site_id = resolve_site(config.client, site_id)
+        device_id = resolve_device(config.client, site_id, device_id)
+        data = config.client.get_json(f"/sites/{site_id}/devices/{device_id}/statistics/latest")
         print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
+
+def wait_until_online(client, site_id, device_ids, timeout, interval=5):
+    """Poll devices until they all report ONLINE, returning the IDs that did not within ``timeout``."""
+    def is_online(device_id):
+        try:
+            return client.get_json(f"/sites/{site_id}/devices/{device_id}", cached=False).get('state') == 'ONLINE'
+        except (ApiError, RequestException):
+            return False
+
+    pending = list(device_ids)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        states = ordered_map(is_online, pending, client.max_workers)
+        pending = [device_id for device_id, online in zip(pending, list(states)) if not online]
+        if pending:
+            time.sleep(interval)
+    return pending
+
+def bulk_device_ids(client, site_id, ids_file, filter):
+    """Collect the device IDs targeted by a bulk command, from a file/stdin or a list filter."""
+    if ids_file and filter:
+        raise click.UsageError('Use either --ids-file or --filter, not both.')
+    if ids_file:
+        return [resolve_device(client, site_id, target, verify=True) for target in read_targets(ids_file)]
+    if filter:
+        devices = client.get_all(f"/sites/{site_id}/devices", params={'filter': filter}, cached=False)
+        return [device['id'] for device in devices.get('data', [])]
+    raise click.UsageError('Either --ids-file or --filter is required.')
+
+def confirm_bulk(prompt, ids_file, yes):
+    if yes:
+        return
+    if ids_file is not None and ids_file.name == '<stdin>':
+        raise click.UsageError('--yes is required when reading targets from stdin.')
+    click.confirm(prompt, abort=True)
+
+def batches(items, size):
+    size = size or len(items) or 1
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+@devices.command('bulk-restart')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--ids-file', type=click.File('r'), help="File with one device ID, name, MAC or IP per line ('-' for stdin).")
+@click.option('--filter', help='Restart every device matching this list filter.')
+@click.option('--concurrency', type=int, help='Number of concurrent requests (default: max_workers).')
+@click.option('--rate', type=float, help='Maximum requests per second.')
+@click.option('--batch-size', type=int, help='Restart devices in rolling batches of this size.')
+@click.option('--wait-timeout', type=int, default=600, help='Seconds to wait for each batch to come back online before starting the next (0 to not wait).')
+@click.option('--yes', is_flag=True, help='Do not prompt for confirmation.')
+@pass_config
+def bulk_restart(config, site_id, ids_file, filter, concurrency, rate, batch_size, wait_timeout, yes):
+    """Restart many devices at once."""
+    try:
+        site_id = resolve_site(config.client, site_id)
+        device_ids = bulk_device_ids(config.client, site_id, ids_file, filter)
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    if not device_ids:
+        click.echo("No devices matched.", err=True)
+        return
+
+    confirm_bulk(f"Restart {len(device_ids)} devices?", ids_file, yes)
+
+    action = lambda device_id: restart(config.client, site_id, device_id)
+    results = []
+    rounds = batches(device_ids, batch_size)
+    for number, batch in enumerate(rounds, 1):
+        for result in run_bulk(action, batch, concurrency or config.max_workers, rate):
+            echo_result(result, f"device {result.target}")
+            results.append(result)
+
+        if number < len(rounds) and wait_timeout:
+            restarted = [r.target for r in results[-len(batch):] if r.ok]
+            click.echo(f"Batch {number}/{len(rounds)} sent; waiting for {len(restarted)} devices to come back online...", err=True)
+            time.sleep(RESTART_GRACE_SECONDS)
+            offline = wait_until_online(config.client, site_id, restarted, wait_timeout)
+            if offline:
+                click.echo(f"Stopping: {len(offline)} devices did not come back online: {', '.join(offline)}", err=True)
+                break
+
+    skipped = len(device_ids) - len(results)
+    if skipped:
+        click.echo(f"{skipped} devices were not restarted.", err=True)
+    if echo_summary(results) or skipped:
+        click.get_current_context().exit(1)
+
+@devices.command('bulk-power-cycle-port')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--ids-file', type=click.File('r'), help="File with one 'DEVICE[,PORT_IDX]' per line ('-' for stdin).")
+@click.option('--filter', help='Power cycle ports on every device matching this list filter.')
+@click.option('--port-idx', 'port_idxs', type=int, multiple=True, help='Port index to power cycle (repeatable); used for every device without an explicit port.')
+@click.option('--concurrency', type=int, help='Number of concurrent requests (default: max_workers).')
+@click.option('--rate', type=float, help='Maximum requests per second.')
+@click.option('--batch-size', type=int, help='Power cycle ports in rolling batches of this size.')
+@click.option('--batch-interval', type=float, default=10, help='Seconds to pause between batches.')
+@click.option('--yes', is_flag=True, help='Do not prompt for confirmation.')
+@pass_config
+def bulk_power_cycle_port(config, site_id, ids_file, filter, port_idxs, concurrency, rate, batch_size, batch_interval, yes):
+    """Power cycle many ports at once."""
+    try:
+        site_id = resolve_site(config.client, site_id)
+        if ids_file and not filter:
+            targets = []
+            for line in read_targets(ids_file):
+                device, _, port = line.partition(',')
+                device_id = resolve_device(config.client, site_id, device.strip(), verify=True)
+                if port.strip() and not port.strip().isdigit():
+                    raise click.UsageError(f"Invalid port index in line '{line}'.")
+                ports = [int(port)] if port.strip() else port_idxs
+                targets.extend((device_id, port_idx) for port_idx in ports)
+        else:
+            targets = [
+                (device_id, port_idx)
+                for device_id in bulk_device_ids(config.client, site_id, ids_file, filter)
+                for port_idx in port_idxs
+            ]
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    if not targets:
+        click.echo("No ports matched (did you pass --port-idx?).", err=True)
+        return
+
+    confirm_bulk(f"Power cycle {len(targets)} ports?", ids_file, yes)
+
+    action = lambda target: power_cycle(config.client, site_id, *target)
+    results = []
+    rounds = batches(targets, batch_size)
+    for number, batch in enumerate(rounds, 1):
+        for result in run_bulk(action, batch, concurrency or config.max_workers, rate):
+            device_id, port_idx = result.target
+            echo_result(result, f"device {device_id} port {port_idx}")
+            results.append(result)
+        if number < len(rounds) and batch_interval:
+            time.sleep(batch_interval)
+
+    if echo_summary(results):
+        click.get_current_context().exit(1)
+
+@devices.command('watch')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', 'device_ids', multiple=True, help='Device ID, name, MAC or IP to watch (repeatable; default: every device on the site).')
+@click.option('--threshold', 'thresholds', multiple=True, help="Report crossings of a threshold such as 'cpuUtilizationPct>80' (repeatable).")
+@click.option('--thresholds-only', is_flag=True, help='Only report threshold crossings, not changed fields.')
+@click.option('--window', type=click.IntRange(min=1), default=12, help='Samples kept per device for rolling averages.')
+@click.option('--min-interval', type=float, default=5, help='Minimum seconds between polls of a device.')
+@click.option('--max-interval', type=float, default=60, help='Maximum seconds between polls of a device.')
+@click.option('--duration', type=float, help='Stop after this many seconds (default: run until interrupted).')
+@pass_config
+def watch_devices(config, site_id, device_ids, thresholds, thresholds_only, window, min_interval, max_interval, duration):
+    """Continuously poll device statistics, printing only changes and threshold crossings as NDJSON."""
+    try:
+        thresholds = [Threshold(t) for t in thresholds]
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--threshold'")
+
+    try:
+        site_id = resolve_site(config.client, site_id)
+        if device_ids:
+            device_ids = [resolve_device(config.client, site_id, d) for d in device_ids]
+        else:
+            devices = config.client.get_all(f"/sites/{site_id}/devices", page_size=200)
+            device_ids = [device['id'] for device in devices.get('data', [])]
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    emit = lambda event: click.echo(dumps(event))
+    try:
+        watch(config.client, site_id, device_ids, emit, thresholds=thresholds, window=window,
+              min_interval=min_interval, max_interval=max_interval, duration=duration,
+              thresholds_only=thresholds_only)
+    except KeyboardInterrupt:
+        pass
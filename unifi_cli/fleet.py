@@ -0,0 +1,94 @@
+import click
+from fnmatch import fnmatchcase
+from .api import ApiError, RequestException, ordered_map
+from .index import resolve_site
+from .util import handle_api_error, print_json_output, print_list, RecordPrinter
+
+def is_site_selector(site_id):
+    """Whether ``--site-id`` names several sites (a comma-separated list or a glob)."""
+    return site_id is not None and any(c in site_id for c in ',*?[')
+
+def resolve_sites(client, selector=None):
+    """Return the sites whose ID or name matches the selector, or every site if it is None.
+
+    The selector is a comma-separated list of site IDs, names or glob patterns.
+    """
+    sites = client.get_all('/sites', page_size=200).get('data', [])
+    if selector is None:
+        return sites
+    patterns = [p.strip() for p in selector.split(',') if p.strip()]
+    return [
+        site for site in sites
+        if any(fnmatchcase(site['id'], p) or fnmatchcase(site.get('name') or '', p) for p in patterns)
+    ]
+
+def fetch_site_list(client, site, path_template, params, page_size, fetch_all=False):
+    """Fetch a per-site list endpoint and tag each record with its site ID and name."""
+    path = path_template.format(site_id=site['id'])
+    if fetch_all:
+        result = client.get_all(path, params=params, page_size=page_size)
+    else:
+        result = client.get_json(path, params=params)
+    for record in result.get('data', []):
+        record['siteId'] = site['id']
+        record['siteName'] = site.get('name')
+    return result
+
+def print_fleet_list(client, sites, path_template, params, page_size, fetch_all=False, concurrency=None,
+                     raw_json=False, query=None, output_format='json', columns=None):
+    """Fetch a per-site list endpoint for many sites concurrently and print the merged result.
+
+    Sites that fail are reported on stderr without aborting the others.
+    """
+    def fetch(site):
+        try:
+            return fetch_site_list(client, site, path_template, params, page_size, fetch_all)
+        except (ApiError, RequestException) as e:
+            return e
+
+    data = []
+    total = 0
+    printer = RecordPrinter(output_format, query=query, columns=columns) if output_format != 'json' else None
+    results = ordered_map(fetch, sites, concurrency or client.max_workers)
+    for site, result in zip(sites, results):
+        if isinstance(result, Exception):
+            click.echo(f"Site {site['id']} ({site.get('name')}) failed:", err=True)
+            if isinstance(result, ApiError):
+                handle_api_error(result.response)
+            else:
+                click.echo(f"Error: {result}", err=True)
+            continue
+        if printer is not None:
+            printer.write(result.get('data', []))
+        else:
+            data.extend(result.get('data', []))
+            total += result.get('totalCount', 0)
+
+    if printer is not None:
+        printer.finish()
+    else:
+        print_json_output({
+            'count': len(data),
+            'totalCount': total,
+            'sites': len(sites),
+            'data': data
+        }, raw_json=raw_json, query=query)
+
+def print_site_list(client, site_id, all_sites, path_template, params, page_size, fetch_all=False,
+                    concurrency=None, raw_json=False, query=None, output_format='json', columns=None):
+    """Print a per-site list for one site, or fan out across several with --all-sites or a selector."""
+    if not site_id and not all_sites:
+        raise click.UsageError('Either --site-id or --all-sites is required.')
+
+    if all_sites or is_site_selector(site_id):
+        sites = resolve_sites(client, None if all_sites else site_id)
+        if not sites:
+            click.echo(f"No sites match '{site_id}'.", err=True)
+            return
+        print_fleet_list(client, sites, path_template, params, page_size, fetch_all=fetch_all,
+                         concurrency=concurrency, raw_json=raw_json, query=query, output_format=output_format,
+                         columns=columns)
+    else:
+        site_id = resolve_site(client, site_id)
+        print_list(client, path_template.format(site_id=site_id), params, page_size, fetch_all=fetch_all,
+                   raw_json=raw_json, query=query, output_format=output_format, columns=columns)
@@ -1,8 +1,49 @@
+import csv
+import time
+import uuid
 import click
-import requests
 import json
 from .config import pass_config
-from .util import handle_api_error, print_json_output
+from .api import ApiError, RequestException, ordered_map
+from .bulk import run_bulk, echo_summary
+from .util import dumps, handle_api_error, print_json_output, format_api_error, parse_columns, OUTPUT_FORMATS
+from .fleet import print_site_list
+from .index import resolve_site
+
+MAX_VOUCHERS_PER_REQUEST = 1000
+VOUCHER_COLUMNS = ['id', 'code', 'name', 'createdAt', 'timeLimitMinutes', 'authorizedGuestLimit',
+                   'authorizedGuestCount', 'activatedAt', 'expiresAt', 'expired']
+
+class VoucherWriter:
+    """Writes vouchers to a stream as CSV, NDJSON or printable codes, one batch at a time."""
+
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        self.csv = None
+        if output_format == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=VOUCHER_COLUMNS, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, vouchers):
+        if self.csv is not None:
+            self.csv.writerows(vouchers)
+        elif self.output_format == 'ndjson':
+            self.stream.write(''.join(dumps(v) + '\n' for v in vouchers))
+        else:
+            self.stream.write(''.join(format_code(v.get('code', '')) + '\n' for v in vouchers))
+        self.stream.flush()
+
+def format_code(code):
+    """Format a voucher code the way the UniFi portal prints it (e.g. 12345-67890)."""
+    code = str(code)
+    if len(code) == 10 and code.isdigit():
+        return f"{code[:5]}-{code[5:]}"
+    return code
+
+def delete(client, site_id, voucher_id):
+    """Ask the controller to delete a voucher and return the response."""
+    return client.delete(f"/sites/{site_id}/hotspot/vouchers/{voucher_id}")
 
 @click.group()
 def hotspot():
@@ -15,19 +56,20 @@ def vouchers():
     pass
 
 @vouchers.command('list')
-@click.option('--site-id', required=True, help='The ID of the site.')
+@click.option('--site-id', help='The ID of the site, or a comma-separated list or glob of site IDs/names.')
+@click.option('--all-sites', is_flag=True, help='List vouchers across every site.')
+@click.option('--concurrency', type=int, help='Number of sites queried concurrently (default: max_workers).')
 @click.option('--filter', help='Filter the results.')
 @click.option('--offset', type=int, default=0, help='Offset for pagination.')
 @click.option('--limit', type=int, default=100, help='Limit for pagination (max 1000).')
+@click.option('--all', 'fetch_all', is_flag=True, help='Fetch every page concurrently and merge the results (ignores --limit).')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), default='json', help='Output format; ndjson, table, csv and tsv stream one record per line.')
+@click.option('--columns', help='Comma-separated fields (e.g. id,name,uplink.txRateBps) for table, csv and tsv output.')
 @pass_config
-def list_vouchers(config, site_id, filter, offset, limit, json, query):
+def list_vouchers(config, site_id, all_sites, concurrency, filter, offset, limit, fetch_all, json, query, output_format, columns):
     """List all Hotspot vouchers for a site."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     params = {
         'offset': offset,
         'limit': limit
@@ -36,81 +78,253 @@ def list_vouchers(config, site_id, filter, offset, limit, json, query):
         params['filter'] = filter
 
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/hotspot/vouchers", headers=headers, params=params, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
-        print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+        print_site_list(config.client, site_id, all_sites, "/sites/{site_id}/hotspot/vouchers", params, page_size=1000,
+                        fetch_all=fetch_all, concurrency=concurrency, raw_json=json, query=query,
+                        output_format=output_format, columns=parse_columns(columns))
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @vouchers.command('generate')
-@click.option('--site-id', required=True, help='The ID of the site.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
 @click.option('--count', default=1, help='Number of vouchers to generate.')
 @click.option('--name', required=True, help='Voucher note.')
 @click.option('--time-limit', required=True, type=int, help='Voucher time limit in minutes.')
 @pass_config
 def generate_vouchers(config, site_id, count, name, time_limit):
     """Generate Hotspot vouchers."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     data = {
         'count': count,
         'name': name,
         'timeLimitMinutes': time_limit
     }
     try:
-        response = requests.post(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/hotspot/vouchers", headers=headers, json=data, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        response = config.client.post(f"/sites/{site_id}/hotspot/vouchers", json=data)
         if not response.ok:
             handle_api_error(response)
             return
         data = response.json()
         click.echo(json.dumps(data, indent=4))
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @vouchers.command('delete')
-@click.option('--site-id', required=True, help='The ID of the site.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
 @click.option('--voucher-id', required=True, help='The ID of the voucher to delete.')
 @click.confirmation_option(prompt='Are you sure you want to delete this voucher?')
 @pass_config
 def delete_voucher(config, site_id, voucher_id):
     """Delete a specific Hotspot voucher."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.delete(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/hotspot/vouchers/{voucher_id}", headers=headers, verify=False)
+        site_id = resolve_site(config.client, site_id)
+        response = delete(config.client, site_id, voucher_id)
         if not response.ok:
             handle_api_error(response)
             return
         data = response.json()
         click.echo(json.dumps(data, indent=4))
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
 
 @vouchers.command('get')
-@click.option('--site-id', required=True, help='The ID of the site.')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
 @click.option('--voucher-id', required=True, help='The ID of the voucher.')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
 @pass_config
 def get_voucher(config, site_id, voucher_id, json, query):
     """Retrieve details of a specific Hotspot voucher."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites/{site_id}/hotspot/vouchers/{voucher_id}", headers=headers, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
+        site_id = resolve_site(config.client, site_id)
+        data = config.client.get_json(f"/sites/{site_id}/hotspot/vouchers/{voucher_id}")
         print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
+
+def create_voucher_chunk(client, site_id, data, retries, backoff=1.0):
+    """Create one controller-sized batch of vouchers, retrying idempotently.
+
+    Each batch carries a unique ``name``; before a retry the vouchers already
+    created under that name are fetched so a request that timed out after
+    succeeding on the controller is not duplicated.
+    """
+    path = f"/sites/{site_id}/hotspot/vouchers"
+    created = []
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            if attempt:
+                existing = client.get_all(path, params={'filter': f"name.eq('{data['name']}')"},
+                                          page_size=MAX_VOUCHERS_PER_REQUEST, cached=False)
+                created = existing.get('data', [])
+                if len(created) >= data['count']:
+                    return created
+            response = client.post(path, json={**data, 'count': data['count'] - len(created)})
+            if response.ok:
+                return created + response.json().get('vouchers', [])
+            error = format_api_error(response)
+        except ApiError as e:
+            error = format_api_error(e.response)
+        except RequestException as e:
+            error = str(e)
+    raise click.ClickException(f"Voucher batch '{data['name']}' failed after {retries + 1} attempts: {error}")
+
+@vouchers.command('generate-bulk')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--count', required=True, type=click.IntRange(min=1), help='Total number of vouchers to generate.')
+@click.option('--name', required=True, help='Voucher note; each batch gets a unique " #<run>-<n>" suffix.')
+@click.option('--time-limit', required=True, type=int, help='Voucher time limit in minutes.')
+@click.option('--guest-limit', type=int, help='Number of guests that may use each voucher.')
+@click.option('--data-usage-limit', type=int, help='Data usage limit in megabytes.')
+@click.option('--rx-rate-limit', type=int, help='Download rate limit in kilobits per second.')
+@click.option('--tx-rate-limit', type=int, help='Upload rate limit in kilobits per second.')
+@click.option('--batch-size', type=click.IntRange(1, MAX_VOUCHERS_PER_REQUEST), default=MAX_VOUCHERS_PER_REQUEST, help='Vouchers created per request (max 1000).')
+@click.option('--concurrency', type=int, help='Number of batches created concurrently (default: max_workers).')
+@click.option('--retries', type=int, default=3, help='Retries per failed batch.')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'ndjson', 'text']), default='csv', help='Output format; text prints one formatted code per line.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write vouchers to (default: stdout).')
+@pass_config
+def generate_vouchers_bulk(config, site_id, count, name, time_limit, guest_limit, data_usage_limit,
+                           rx_rate_limit, tx_rate_limit, batch_size, concurrency, retries, output_format, output):
+    """Generate a large number of Hotspot vouchers in concurrent batches, streaming them out as they are created."""
+    template = {
+        'timeLimitMinutes': time_limit
+    }
+    if guest_limit is not None:
+        template['authorizedGuestLimit'] = guest_limit
+    if data_usage_limit is not None:
+        template['dataUsageLimitMBytes'] = data_usage_limit
+    if rx_rate_limit is not None:
+        template['rxRateLimitKbps'] = rx_rate_limit
+    if tx_rate_limit is not None:
+        template['txRateLimitKbps'] = tx_rate_limit
+
+    run_id = uuid.uuid4().hex[:8]
+    chunks = [
+        {**template, 'name': f"{name} #{run_id}-{number}", 'count': min(batch_size, count - start)}
+        for number, start in enumerate(range(0, count, batch_size), 1)
+    ]
+
+    try:
+        site_id = resolve_site(config.client, site_id)
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    def create(chunk):
+        try:
+            return create_voucher_chunk(config.client, site_id, chunk, retries)
+        except click.ClickException as e:
+            return e
+
+    writer = VoucherWriter(output, output_format)
+    generated = 0
+    failed = 0
+    for chunk, result in zip(chunks, ordered_map(create, chunks, concurrency or config.max_workers)):
+        if isinstance(result, click.ClickException):
+            click.echo(f"Error: {result.message}", err=True)
+            failed += chunk['count']
+            continue
+        writer.write(result)
+        generated += len(result)
+        click.echo(f"Generated {generated}/{count} vouchers.", err=True)
+
+    if failed:
+        click.echo(f"{failed} vouchers could not be generated.", err=True)
+        click.get_current_context().exit(1)
+
+@vouchers.command('export')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--filter', help='Filter the results.')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'ndjson', 'text']), default='csv', help='Output format; text prints one formatted code per line.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write vouchers to (default: stdout).')
+@pass_config
+def export_vouchers(config, site_id, filter, output_format, output):
+    """Export every Hotspot voucher for a site, page by page."""
+    params = {}
+    if filter:
+        params['filter'] = filter
+
+    writer = VoucherWriter(output, output_format)
+    try:
+        site_id = resolve_site(config.client, site_id)
+        pages = config.client.iter_pages(f"/sites/{site_id}/hotspot/vouchers", params=params,
+                                         page_size=MAX_VOUCHERS_PER_REQUEST, cached=False)
+        for page in pages:
+            writer.write(page.get('data', []))
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+
+def is_unused(voucher):
+    return not voucher.get('activatedAt') and not voucher.get('authorizedGuestCount')
+
+@vouchers.command('purge')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--filter', help='Only consider vouchers matching this list filter.')
+@click.option('--expired', is_flag=True, help='Only delete expired vouchers.')
+@click.option('--unused', is_flag=True, help='Only delete vouchers that were never activated.')
+@click.option('--dry-run', is_flag=True, help='Only count the vouchers that would be deleted.')
+@click.option('--concurrency', type=int, help='Number of concurrent deletes (default: max_workers).')
+@click.option('--rate', type=float, help='Maximum deletes per second.')
+@click.option('--yes', is_flag=True, help='Do not prompt for confirmation.')
+@pass_config
+def purge_vouchers(config, site_id, filter, expired, unused, dry_run, concurrency, rate, yes):
+    """Delete every Hotspot voucher matching a filter and/or selectors."""
+    if not (filter or expired or unused):
+        raise click.UsageError('Refusing to purge every voucher: pass --filter, --expired and/or --unused.')
+
+    params = {}
+    if filter:
+        params['filter'] = filter
+
+    voucher_ids = []
+    try:
+        site_id = resolve_site(config.client, site_id)
+        pages = config.client.iter_pages(f"/sites/{site_id}/hotspot/vouchers", params=params,
+                                         page_size=MAX_VOUCHERS_PER_REQUEST, cached=False)
+        for page in pages:
+            voucher_ids.extend(
+                v['id'] for v in page.get('data', [])
+                if (not expired or v.get('expired')) and (not unused or is_unused(v))
+            )
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    if dry_run or not voucher_ids:
+        click.echo(f"{len(voucher_ids)} vouchers would be deleted.")
+        return
+    if not yes:
+        click.confirm(f"Delete {len(voucher_ids)} vouchers?", abort=True)
+
+    action = lambda voucher_id: delete(config.client, site_id, voucher_id)
+    results = run_bulk(action, voucher_ids, concurrency or config.max_workers, rate)
+    done = []
+    with click.progressbar(results, length=len(voucher_ids), label='Deleting vouchers',
+                           file=click.get_text_stream('stderr')) as bar:
+        for result in bar:
+            done.append(result)
+
+    for result in done:
+        if not result.ok:
+            click.echo(f"FAILED  voucher {result.target}: {result.error}")
+    if echo_summary(done):
+        click.get_current_context().exit(1)
@@ -0,0 +1,220 @@
+import re
+import time
+import sqlite3
+import threading
+import click
+from pathlib import Path
+from .api import ApiError
+from .cache import default_cache_dir
+
+UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+MAC_PATTERN = re.compile(r'^[0-9a-f]{2}([:-][0-9a-f]{2}){5}$', re.IGNORECASE)
+IP_PATTERN = re.compile(r'^\d{1,3}(\.\d{1,3}){3}$')
+
+_LIST_PATH = re.compile(r'^/sites(?:/([^/]+)/(devices|clients))?$')
+_ITEM_PATH = re.compile(r'^/sites/([^/]+)/(devices|clients)/([^/]+)$')
+
+# How long, in seconds, an indexed identifier is trusted without being seen
+# again in a list or get response.
+DEFAULT_TTL = 24 * 3600
+
+def normalize(value):
+    """Normalize a human identifier for lookup: lower-case, with MACs colon-separated."""
+    value = value.strip().lower()
+    if MAC_PATTERN.match(value):
+        value = value.replace('-', ':')
+    return value
+
+def _keys(kind, record):
+    if kind == 'sites':
+        fields = ('id', 'name', 'internalReference')
+    else:
+        fields = ('id', 'name', 'macAddress', 'ipAddress')
+    return {normalize(str(record[f])) for f in fields if record.get(f)}
+
+class IdentifierIndex:
+    """A persistent map from site names, device names/MACs/IPs and client
+    MACs/hostnames/IPs to the UUIDs the API expects.
+
+    The index is filled in as a side effect of list and get responses, so
+    lookups are a single keyed read; a miss triggers a targeted refresh.
+    Entries not seen again within ``ttl`` seconds are treated as misses.
+    A name or hostname may map to several IDs (two clients called "iPhone"),
+    so every ID is kept and lookups return all of them.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        path = Path(path) if path else default_cache_dir() / 'index.sqlite'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] < self.SCHEMA_VERSION:
+            # Older layouts kept one ID per key; the index is only a cache, so start over.
+            self._db.execute('DROP TABLE IF EXISTS identifiers')
+            self._db.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS identifiers ('
+            ' controller TEXT, kind TEXT, site TEXT, key TEXT, id TEXT, mac TEXT, seen_at REAL,'
+            ' PRIMARY KEY (controller, kind, site, key, id))'
+        )
+        self._db.execute('DELETE FROM identifiers WHERE seen_at < ?', (time.time() - self.ttl,))
+
+    def record(self, controller, path, data):
+        """Index the records in a response, if ``path`` is a site, device or client endpoint."""
+        match = _LIST_PATH.match(path)
+        if match:
+            site, kind = match.groups()
+            records = data.get('data', [])
+        else:
+            match = _ITEM_PATH.match(path)
+            if not match:
+                return
+            site, kind, _ = match.groups()
+            records = [data]
+        kind = kind or 'sites'
+        site = site or ''
+
+        now = time.time()
+        ids = [(controller, kind, site, record['id']) for record in records if record.get('id')]
+        rows = [
+            (controller, kind, site, key, record['id'], record.get('macAddress'), now)
+            for record in records if record.get('id')
+            for key in _keys(kind, record)
+        ]
+        if rows:
+            # One transaction per response: in autocommit mode every row
+            # would otherwise be committed (and synced) on its own.
+            with self._lock:
+                self._db.execute('BEGIN')
+                try:
+                    # Forget the keys a record had before, e.g. its old name or IP.
+                    self._db.executemany(
+                        'DELETE FROM identifiers WHERE controller = ? AND kind = ? AND site = ? AND id = ?', ids
+                    )
+                    self._db.executemany('INSERT OR REPLACE INTO identifiers VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+                self._db.execute('COMMIT')
+
+    def lookup(self, controller, kind, site, value, since=None):
+        """Return every ``(id, mac)`` indexed for an identifier, most recently seen first.
+
+        Only entries seen after ``since`` (default: within the TTL) count.
+        """
+        if since is None:
+            since = time.time() - self.ttl
+        with self._lock:
+            return self._db.execute(
+                'SELECT id, mac FROM identifiers'
+                ' WHERE controller = ? AND kind = ? AND site = ? AND key = ? AND seen_at >= ?'
+                ' ORDER BY seen_at DESC',
+                (controller, kind, site or '', normalize(value), since)
+            ).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM identifiers')
+
+def _filter_for(kind, value):
+    value = value.strip()
+    if kind == 'sites':
+        field = 'name'
+    elif MAC_PATTERN.match(value):
+        field = 'macAddress'
+        value = normalize(value)
+    elif IP_PATTERN.match(value):
+        field = 'ipAddress'
+    else:
+        field = 'name'
+    return f"{field}.eq('{value}')"
+
+def _refresh(client, kind, site, value):
+    """Re-fetch just enough of a list endpoint to index ``value``.
+
+    A filtered request is tried first; if the controller rejects the filter
+    or finds nothing, the site's full list is fetched instead.
+    """
+    path = '/sites' if kind == 'sites' else f"/sites/{site}/{kind}"
+    try:
+        page = client.get_json(path, params={'filter': _filter_for(kind, value), 'limit': 200}, cached=False)
+        if page.get('data'):
+            return
+    except ApiError:
+        pass
+    client.get_all(path, page_size=200, cached=False)
+
+def volatile(kind, value):
+    """Whether an identifier can move to another device or client: an IP address or a client hostname."""
+    value = value.strip()
+    if IP_PATTERN.match(value):
+        return True
+    return kind == 'clients' and not MAC_PATTERN.match(value) and not UUID_PATTERN.match(value)
+
+def _resolve(client, kind, site, value, verify=False):
+    index = client.index
+    if index is None:
+        return None
+    # About to act on a volatile identifier: only trust what the controller reports now.
+    hits = [] if verify and volatile(kind, value) else index.lookup(client.url, kind, site, value)
+    if len(hits) != 1:
+        # A miss, or several candidates of which some may be stale: ask the
+        # controller, and keep only what it returned.
+        started = time.time()
+        _refresh(client, kind, site, value)
+        hits = index.lookup(client.url, kind, site, value, since=started)
+    if len(hits) > 1:
+        candidates = ', '.join(f"{id} ({mac})" if mac else id for id, mac in hits)
+        raise click.UsageError(f"'{value}' matches {len(hits)} {kind}: {candidates}. Use an ID or MAC address instead.")
+    return hits[0] if hits else None
+
+def resolve_site(client, value):
+    """Resolve a site ID, name or internal reference to a site ID."""
+    if UUID_PATTERN.match(value):
+        return value
+    hit = _resolve(client, 'sites', None, value)
+    return hit[0] if hit else value
+
+def resolve_device(client, site_id, value, verify=False):
+    """Resolve a device ID, name, MAC or IP address to a device ID.
+
+    With ``verify``, an IP address is re-checked against the controller
+    rather than trusted from the index; mutating commands pass it.
+    """
+    if UUID_PATTERN.match(value):
+        return value
+    hit = _resolve(client, 'devices', site_id, value, verify)
+    if hit is None and not MAC_PATTERN.match(value) and not IP_PATTERN.match(value):
+        return value
+    if hit is None:
+        raise click.ClickException(f"No device matching '{value}' on site {site_id}.")
+    return hit[0]
+
+def resolve_client(client, site_id, value, verify=False):
+    """Resolve a client ID, MAC, hostname or IP address to a client ID.
+
+    With ``verify``, a hostname or IP address is re-checked against the
+    controller rather than trusted from the index.
+    """
+    if UUID_PATTERN.match(value):
+        return value
+    hit = _resolve(client, 'clients', site_id, value, verify)
+    if hit is None and not MAC_PATTERN.match(value) and not IP_PATTERN.match(value):
+        return value
+    if hit is None:
+        raise click.ClickException(f"No client matching '{value}' on site {site_id}.")
+    return hit[0]
+
+def resolve_client_mac(client, site_id, value, verify=False):
+    """Resolve a client MAC, ID, hostname or IP address to its MAC address."""
+    if MAC_PATTERN.match(value):
+        return normalize(value)
+    hit = _resolve(client, 'clients', site_id, value, verify)
+    if hit is None or not hit[1]:
+        raise click.ClickException(f"No client matching '{value}' on site {site_id}.")
+    return hit[1].lower()
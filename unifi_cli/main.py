@@ -1,23 +1,139 @@
 import click
-from .config import pass_config
+import importlib
+from .config import Config, load_config_file
+from .remote import command_path
 
-@click.group()
-@pass_config
-def cli(config):
+# Subcommand name -> "module:attribute". Modules are only imported when the
+# command is actually invoked (or listed by --help / shell completion).
+COMMANDS = {
+    'sites': 'unifi_cli.sites:sites',
+    'devices': 'unifi_cli.devices:devices',
+    'clients': 'unifi_cli.clients:clients',
+    'hotspot': 'unifi_cli.hotspot:hotspot',
+    'info': 'unifi_cli.app:info',
+    'stats': 'unifi_cli.stats:stats',
+    'sync': 'unifi_cli.sync:sync',
+    'batch': 'unifi_cli.batch:batch',
+    'serve-metrics': 'unifi_cli.metrics:serve_metrics',
+    'daemon': 'unifi_cli.daemon:daemon',
+}
+
+class LazyGroup(click.Group):
+    """A click group whose subcommands are imported on first use."""
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = dict(lazy_commands or {})
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            module_name, attribute = self.lazy_commands[cmd_name].split(':')
+            self.add_command(getattr(importlib.import_module(module_name), attribute), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def resolve_command(self, ctx, args):
+        cmd_name, cmd, args = super().resolve_command(ctx, args)
+        ctx.meta['unifi.command'] = command_path([cmd_name] + args)
+        controllers = ctx.params.get('controller')
+        if controllers and len(controllers) > 1 and cmd is not None and '--help' not in args:
+            from .controllers import ControllerCommand
+            cmd = ControllerCommand(cmd_name, cmd)
+        return cmd_name, cmd, args
+
+def resolve_argv(argv):
+    """Parse ``argv`` against the command tree without running anything.
+
+    Returns the subcommand path (e.g. ``('devices', 'watch')``), the command
+    it names and that command's context. Options are parsed with each
+    group's own option table, so the value of a global option such as
+    ``--controller eu`` is never taken for a command name.
+    """
+    ctx = cli.make_context('unifi', list(argv), resilient_parsing=True)
+    command, path = cli, []
+    while isinstance(command, click.Group):
+        args = [*ctx._protected_args, *ctx.args]
+        if not args:
+            break
+        name, subcommand, args = click.Group.resolve_command(command, ctx, args)
+        if subcommand is None:
+            break
+        path.append(name)
+        ctx = subcommand.make_context(name, args, parent=ctx, resilient_parsing=True)
+        command = subcommand
+    return tuple(path), command, ctx
+
+def select_controllers(ctx, param, value):
+    """Expand ``--controller`` into a list of profile names."""
+    if not value:
+        return None
+    from .controllers import select_controllers
+    return select_controllers(load_config_file().get('controllers', {}), value)
+
+def start_tracing(ctx, summary, path):
+    """Trace requests and local work until the command finishes, then report them."""
+    from . import trace
+    tracer = trace.Tracer(' '.join(('unifi',) + ctx.meta['unifi.command']))
+    trace.tracer = tracer
+
+    def finish():
+        trace.tracer = None
+        tracer.finish()
+        if path:
+            tracer.write(path)
+        if summary:
+            click.echo(tracer.summary(), err=True)
+    ctx.call_on_close(finish)
+
+def start_profiling(ctx, summary, path):
+    """Profile the command until it finishes, then print and/or save the stats."""
+    from .trace import Profiler
+    profiler = Profiler()
+    profiler.start()
+
+    def finish():
+        profiler.stop()
+        stats = profiler.stats()
+        if path:
+            stats.dump_stats(path)
+        if summary:
+            stats.sort_stats('cumulative').print_stats(30)
+    ctx.call_on_close(finish)
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
+@click.option('--no-cache', is_flag=True, help='Bypass the local response cache entirely.')
+@click.option('--refresh', is_flag=True, help='Ignore cached responses but store fresh ones.')
+@click.option('--controller', envvar='UNIFI_CONTROLLER', callback=select_controllers,
+              help="Controller profile to use: a name, a comma-separated list or glob of names, or 'all'. "
+                   "Read commands run against several controllers concurrently.")
+@click.option('--trace', 'trace_summary', is_flag=True, help='Print a breakdown of request timings and local work to stderr.')
+@click.option('--trace-file', type=click.Path(dir_okay=False), help='Write a Chrome trace (chrome://tracing, Perfetto) of the requests and local work to this file.')
+@click.option('--profile', is_flag=True, help='Run the command under cProfile and print the 30 most expensive functions to stderr.')
+@click.option('--profile-file', type=click.Path(dir_okay=False), help='Run the command under cProfile and save the stats to this file.')
+@click.pass_context
+def cli(ctx, no_cache, refresh, controller, trace_summary, trace_file, profile, profile_file):
     """A CLI tool to interact with the UniFi Network API."""
-    pass
-
-from .sites import sites
-from .devices import devices
-from .clients import clients
-from .hotspot import hotspot
-from .app import info
-
-cli.add_command(sites)
-cli.add_command(devices)
-cli.add_command(clients)
-cli.add_command(hotspot)
-cli.add_command(info)
+    if trace_summary or trace_file:
+        start_tracing(ctx, trace_summary, trace_file)
+    if profile or profile_file:
+        start_profiling(ctx, profile, profile_file)
+
+    if controller and len(controller) > 1:
+        configs = [Config(name) for name in controller]
+        ctx.meta['unifi.controllers'] = configs
+    elif controller:
+        if ctx.obj is None or ctx.obj.controller != controller[0]:
+            ctx.obj = Config(controller[0])
+        configs = [ctx.obj]
+    else:
+        configs = [ctx.ensure_object(Config)]
+
+    for config in configs:
+        if no_cache:
+            config.use_cache = False
+        config.refresh_cache = refresh
 
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,239 @@
+import time
+import threading
+import traceback
+import click
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .config import pass_config
+from .api import ApiError, RequestException, ordered_map
+from .util import format_api_error
+from .fleet import resolve_sites
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric name, path in /statistics/latest, help text)
+DEVICE_STATISTICS = [
+    ('unifi_device_uptime_seconds', ('uptimeSec',), 'Device uptime in seconds.'),
+    ('unifi_device_cpu_utilization_percent', ('cpuUtilizationPct',), 'Device CPU utilization.'),
+    ('unifi_device_memory_utilization_percent', ('memoryUtilizationPct',), 'Device memory utilization.'),
+    ('unifi_device_load_average_1m', ('loadAverage1Min',), 'Device 1 minute load average.'),
+    ('unifi_device_uplink_tx_bits_per_second', ('uplink', 'txRateBps'), 'Device uplink transmit rate.'),
+    ('unifi_device_uplink_rx_bits_per_second', ('uplink', 'rxRateBps'), 'Device uplink receive rate.'),
+]
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricFamily:
+    def __init__(self, name, help_text, kind='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.samples = []
+
+    def add(self, value, **labels):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.samples.append((labels, value))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples:
+            label_text = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+            lines.append(f"{self.name}{{{label_text}}} {value}" if label_text else f"{self.name} {value}")
+        return '\n'.join(lines)
+
+def _dig(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+class MetricsCollector:
+    """Builds a Prometheus text-format snapshot of devices, clients and vouchers for a set of sites."""
+
+    def __init__(self, client, site_selector=None, statistics=True, concurrency=None):
+        self.client = client
+        self.site_selector = site_selector
+        self.statistics = statistics
+        self.concurrency = concurrency or client.max_workers
+        self.errors = 0
+
+    def collect_site(self, site):
+        """Fetch everything exported for one site, returning ``(devices, stats, clients, vouchers)``."""
+        base = f"/sites/{site['id']}"
+        devices = self.client.get_all(f"{base}/devices", page_size=200, cached=False).get('data', [])
+        stats = {}
+        if self.statistics:
+            def latest(device):
+                try:
+                    return self.client.get_json(f"{base}/devices/{device['id']}/statistics/latest", cached=False)
+                except (ApiError, RequestException):
+                    return None
+            stats = dict(zip((d['id'] for d in devices), ordered_map(latest, devices, self.concurrency)))
+
+        clients = Counter()
+        for page in self.client.iter_pages(f"{base}/clients", page_size=200, cached=False):
+            clients.update(c.get('type') or 'UNKNOWN' for c in page.get('data', []))
+
+        vouchers = Counter()
+        for page in self.client.iter_pages(f"{base}/hotspot/vouchers", page_size=1000, cached=False):
+            vouchers.update('expired' if v.get('expired') else 'valid' for v in page.get('data', []))
+        return devices, stats, clients, vouchers
+
+    def collect(self):
+        started = time.time()
+        families = {name: MetricFamily(name, help_text) for name, _, help_text in DEVICE_STATISTICS}
+        device_info = MetricFamily('unifi_device_info', 'Adopted device metadata.')
+        device_states = MetricFamily('unifi_devices', 'Number of adopted devices by state.')
+        client_types = MetricFamily('unifi_clients', 'Number of connected clients by type.')
+        voucher_states = MetricFamily('unifi_hotspot_vouchers', 'Number of Hotspot vouchers by state.')
+        site_up = MetricFamily('unifi_site_scrape_success', 'Whether the last refresh of the site succeeded.')
+
+        sites = resolve_sites(self.client, self.site_selector)
+
+        def collect_site(site):
+            try:
+                return self.collect_site(site)
+            except ApiError as e:
+                return format_api_error(e.response)
+            except RequestException as e:
+                return str(e)
+
+        for site, result in zip(sites, ordered_map(collect_site, sites, self.concurrency)):
+            labels = {'site_id': site['id'], 'site': site.get('name', '')}
+            if isinstance(result, str):
+                self.errors += 1
+                click.echo(f"Site {site['id']}: {result}", err=True)
+                site_up.add(0, **labels)
+                continue
+            site_up.add(1, **labels)
+            devices, stats, clients, vouchers = result
+            for state, count in Counter(d.get('state') or 'UNKNOWN' for d in devices).items():
+                device_states.add(count, state=state, **labels)
+            for device in devices:
+                device_labels = {**labels, 'device_id': device['id'], 'device': device.get('name', '')}
+                device_info.add(1, model=device.get('model', ''), mac=device.get('macAddress', ''), **device_labels)
+                for name, path, _ in DEVICE_STATISTICS:
+                    families[name].add(_dig(stats.get(device['id']), path), **device_labels)
+            for client_type, count in clients.items():
+                client_types.add(count, type=client_type, **labels)
+            for state, count in vouchers.items():
+                voucher_states.add(count, state=state, **labels)
+
+        refresh = MetricFamily('unifi_exporter_refresh_duration_seconds', 'Time taken by the last refresh.')
+        refresh.add(round(time.time() - started, 3))
+        refreshed_at = MetricFamily('unifi_exporter_last_refresh_timestamp_seconds', 'When the snapshot was taken.')
+        refreshed_at.add(round(time.time(), 3))
+
+        ordered = [site_up, device_info, device_states, *families.values(), client_types, voucher_states,
+                   refresh, refreshed_at]
+        return '\n'.join(f.render() for f in ordered) + '\n'
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves the latest snapshot on /metrics while a background thread refreshes it.
+
+    If a refresh fails the previous snapshot keeps being served, followed by
+    ``unifi_scrape_success 0`` and the time of the last successful refresh,
+    so that stale data can be alerted on.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, collector, interval):
+        super().__init__(address, MetricsHandler)
+        self.collector = collector
+        self.interval = interval
+        self.snapshot = None
+        self.succeeded = None
+        self.last_success = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        try:
+            snapshot = self.collector.collect().encode()
+        except (ApiError, RequestException) as e:
+            self.collector.errors += 1
+            self.succeeded = False
+            click.echo(f"Refresh failed: {e}", err=True)
+            return
+        except Exception as e:
+            # Keep the exporter alive (and reporting the failure) whatever went wrong.
+            self.collector.errors += 1
+            self.succeeded = False
+            click.echo(f"Refresh failed: {e!r}", err=True)
+            traceback.print_exc()
+            return
+        self.snapshot = snapshot
+        self.succeeded = True
+        self.last_success = time.time()
+
+    def refresh_forever(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def render(self):
+        """The latest snapshot plus the exporter's own status, or None before the first refresh finishes."""
+        if self.succeeded is None:
+            return None
+        success = MetricFamily('unifi_scrape_success', 'Whether the last refresh of the controller succeeded.')
+        success.add(1 if self.succeeded else 0)
+        last_success = MetricFamily('unifi_scrape_last_success_timestamp_seconds',
+                                    'When the last successful refresh finished.')
+        if self.last_success is not None:
+            last_success.add(round(self.last_success, 3))
+        errors = MetricFamily('unifi_exporter_refresh_errors_total', 'Failed refreshes of the controller or a site.',
+                              kind='counter')
+        errors.add(self.collector.errors)
+        status = '\n'.join(f.render() for f in (success, last_success, errors)) + '\n'
+        return (self.snapshot or b'') + status.encode()
+
+    def shutdown(self):
+        self._stop.set()
+        super().shutdown()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        snapshot = self.server.render()
+        if snapshot is None:
+            self.send_error(503, 'First refresh has not completed yet.')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(snapshot)))
+        self.end_headers()
+        self.wfile.write(snapshot)
+
+    def log_message(self, format, *args):
+        pass
+
+@click.command('serve-metrics')
+@click.option('--site-id', help='Comma-separated list or glob of site IDs/names to export (default: every site).')
+@click.option('--host', default='127.0.0.1', help='Address to listen on.')
+@click.option('--port', type=int, default=9380, help='Port to listen on.')
+@click.option('--interval', type=click.FloatRange(min=1), default=60, help='Seconds between background refreshes.')
+@click.option('--no-statistics', is_flag=True, help='Skip per-device /statistics/latest requests.')
+@click.option('--concurrency', type=int, help='Concurrent requests per refresh (default: max_workers).')
+@pass_config
+def serve_metrics(config, site_id, host, port, interval, no_statistics, concurrency):
+    """Expose devices, clients and vouchers as Prometheus metrics on /metrics.
+
+    The controller is polled on a fixed schedule in the background; scrapes
+    are always served from the latest snapshot, so the number of scrapers
+    does not affect the load on the controller.
+    """
+    collector = MetricsCollector(config.client, site_selector=site_id, statistics=not no_statistics,
+                                 concurrency=concurrency)
+    server = MetricsServer((host, port), collector, interval)
+    threading.Thread(target=server.refresh_forever, daemon=True).start()
+    click.echo(f"Serving metrics on http://{host}:{port}/metrics", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,103 @@
+import re
+from functools import lru_cache
+
+# JMESPath expressions are compiled once per process and kept in a small LRU,
+# so a query applied per page, per record or per daemon request is parsed once.
+CACHE_SIZE = 128
+
+_IDENTIFIER = r'[A-Za-z_][A-Za-z0-9_]*'
+_PATH = rf'{_IDENTIFIER}(?:\.{_IDENTIFIER})*'
+_PAIR = rf'\s*({_IDENTIFIER})\s*:\s*({_PATH})\s*'
+_FAST_QUERY = re.compile(
+    rf'^\s*(?P<base>{_PATH})?(?:(?P<projection>\[\]|\[\*\])'
+    rf'(?:\.(?:(?P<field>{_PATH})|\{{(?P<hash>{_PAIR}(?:,{_PAIR})*)\}}))?)?\s*$'
+)
+_PAIRS = re.compile(_PAIR)
+
+def _getter(path):
+    """Field access along a dotted path, with JMESPath's null semantics."""
+    keys = path.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+
+        def get(value):
+            return value.get(key) if isinstance(value, dict) else None
+        return get
+
+    def get(value):
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get
+
+def _hash(pairs):
+    """A multi-select hash such as ``{name: name, mac: macAddress}``."""
+    getters = [(key, _getter(path)) for key, path in pairs]
+
+    def select(value):
+        if value is None:
+            return None
+        return {key: get(value) for key, get in getters}
+    return select
+
+def _fast_path(expression):
+    """Compile the common subset ``a.b``, ``a[].b.c``, ``a[*].{k: b, ...}``
+    into plain Python, or return None if ``expression`` is anything else."""
+    match = _FAST_QUERY.match(expression)
+    if not match or not (match.group('base') or match.group('projection')):
+        return None
+
+    base = _getter(match.group('base')) if match.group('base') else None
+    projection = match.group('projection')
+    if projection is None:
+        return base
+
+    if match.group('field'):
+        element = _getter(match.group('field'))
+    elif match.group('hash'):
+        element = _hash(_PAIRS.findall(match.group('hash')))
+    else:
+        element = None
+    flatten = projection == '[]'
+
+    def search(data):
+        value = base(data) if base else data
+        if not isinstance(value, list):
+            return None
+        if flatten:
+            items = []
+            for item in value:
+                if isinstance(item, list):
+                    items.extend(item)
+                else:
+                    items.append(item)
+        else:
+            items = value
+        if element is None:
+            return [item for item in items if item is not None]
+        result = []
+        for item in items:
+            item = element(item)
+            if item is not None:
+                result.append(item)
+        return result
+    return search
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_query(expression):
+    """Return a function that applies the JMESPath ``expression`` to a document.
+
+    Simple field paths and projections are evaluated directly; everything else
+    goes through a compiled ``jmespath`` expression.
+    """
+    search = _fast_path(expression)
+    if search is None:
+        import jmespath
+        search = jmespath.compile(expression).search
+    return search
+
+def search(expression, data):
+    """Like ``jmespath.search``, but with compiled expressions cached per process."""
+    return compile_query(expression)(data)
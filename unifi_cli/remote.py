@@ -0,0 +1,130 @@
+"""The ``unifi`` entry point.
+
+When a daemon (``unifi daemon start``) is listening, invocations are forwarded
+to it over a Unix socket and its output is relayed back, so the command runs
+with a warm configuration, connection pool and caches. Otherwise the CLI runs
+in-process as usual. This module deliberately imports only the standard
+library so that the forwarding path stays cheap.
+"""
+import io
+import os
+import sys
+import json
+import socket
+import struct
+import hashlib
+from pathlib import Path
+
+_HEADER = struct.Struct('!cI')
+
+def socket_path():
+    path = os.environ.get('UNIFI_DAEMON_SOCKET')
+    if path:
+        return Path(path)
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'unifi-cli' / 'daemon.sock'
+
+def fingerprint():
+    """Identify the configuration an invocation would load, so a daemon started
+    with a different environment or config file is never used."""
+    env = sorted((k, v) for k, v in os.environ.items()
+                 if k.startswith('UNIFI_') and k not in ('UNIFI_DAEMON_SOCKET', 'UNIFI_NO_DAEMON'))
+    config_file = Path.home() / '.unifi_cli.json'
+    mtime = config_file.stat().st_mtime if config_file.exists() else None
+    raw = json.dumps([env, str(config_file), mtime])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def send_frame(sock, kind, payload=b''):
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise ConnectionError('daemon closed the connection')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_frame(sock):
+    kind, size = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return kind, _recv_exact(sock, size)
+
+def command_path(argv):
+    """The leading subcommand names of an argument list, e.g. ('devices', 'list')."""
+    path = []
+    for arg in argv:
+        if arg.startswith('-'):
+            if path:
+                break
+            continue
+        path.append(arg)
+    return tuple(path)
+
+def connect(path=None):
+    """Connect to the daemon socket, returning None if no daemon is listening."""
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def forward(argv):
+    """Run ``argv`` on the daemon and relay its output.
+
+    Returns ``(exit_code, None)``, or ``(None, stdin)`` when the command must
+    run in-process instead (``stdin`` is any input already consumed): the
+    daemon refuses requests from a different configuration (``R``) and hands
+    long-running commands, and commands that would prompt, back to the
+    caller (``L``).
+    """
+    if os.environ.get('UNIFI_NO_DAEMON') or sys.stdin.isatty():
+        return None, None
+    sock = connect()
+    if sock is None:
+        return None, None
+
+    # stdin is only sent for a '-' argument, and only once the daemon has
+    # agreed to run the command: reading it otherwise would swallow input
+    # meant for later commands, or block on a pipe that is never closed.
+    stdin = None
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'fingerprint': fingerprint(),
+        'stdin': '-' in argv,
+    }
+    with sock:
+        send_frame(sock, b'Q', json.dumps(request).encode())
+        streams = {b'O': sys.stdout.buffer, b'E': sys.stderr.buffer}
+        while True:
+            try:
+                kind, payload = recv_frame(sock)
+            except ConnectionError:
+                sys.stderr.write('Error: the unifi daemon closed the connection.\n')
+                return 1, None
+            if kind in streams:
+                streams[kind].write(payload)
+                streams[kind].flush()
+            elif kind == b'I':
+                stdin = sys.stdin.read()
+                send_frame(sock, b'I', stdin.encode())
+            elif kind == b'X':
+                return int(payload), None
+            else:
+                return None, stdin
+
+def main():
+    code, stdin = forward(sys.argv[1:])
+    if code is not None:
+        sys.exit(code)
+    if stdin is not None:
+        sys.stdin = io.StringIO(stdin)
+    from .main import cli
+    cli(prog_name='unifi')
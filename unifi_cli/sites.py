@@ -1,8 +1,8 @@
 import click
-import requests
 import json
 from .config import pass_config
-from .util import handle_api_error, print_json_output
+from .api import ApiError, RequestException
+from .util import handle_api_error, print_list, parse_columns, OUTPUT_FORMATS
 
 @click.group()
 def sites():
@@ -13,15 +13,14 @@ def sites():
 @click.option('--filter', help='Filter the results.')
 @click.option('--offset', type=int, default=0, help='Offset for pagination.')
 @click.option('--limit', type=int, default=25, help='Limit for pagination (max 200).')
+@click.option('--all', 'fetch_all', is_flag=True, help='Fetch every page concurrently and merge the results (ignores --limit).')
 @click.option('--json', is_flag=True, help='Output raw JSON.')
 @click.option('--query', help='JMESPath query to apply to the JSON output.')
+@click.option('--format', 'output_format', type=click.Choice(OUTPUT_FORMATS), default='json', help='Output format; ndjson, table, csv and tsv stream one record per line.')
+@click.option('--columns', help='Comma-separated fields (e.g. id,name,uplink.txRateBps) for table, csv and tsv output.')
 @pass_config
-def list_sites(config, filter, offset, limit, json, query):
+def list_sites(config, filter, offset, limit, fetch_all, json, query, output_format, columns):
     """List all sites."""
-    headers = {
-        'X-API-KEY': config.api_key,
-        'Accept': 'application/json'
-    }
     params = {
         'offset': offset,
         'limit': limit
@@ -30,11 +29,9 @@ def list_sites(config, filter, offset, limit, json, query):
         params['filter'] = filter
 
     try:
-        response = requests.get(f"{config.url}/proxy/network/integration/v1/sites", headers=headers, params=params, verify=False)
-        if not response.ok:
-            handle_api_error(response)
-            return
-        data = response.json()
-        print_json_output(data, raw_json=json, query=query)
-    except requests.exceptions.RequestException as e:
+        print_list(config.client, "/sites", params, page_size=200, fetch_all=fetch_all,
+                   raw_json=json, query=query, output_format=output_format, columns=parse_columns(columns))
+    except ApiError as e:
+        handle_api_error(e.response)
+    except RequestException as e:
         click.echo(f"Error: {e}", err=True)
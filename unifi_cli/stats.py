@@ -0,0 +1,382 @@
+import os
+import re
+import json
+import math
+import mmap
+import time
+import fcntl
+import click
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import filterfalse
+from datetime import datetime
+from pathlib import Path
+from .config import pass_config
+from .api import ApiError, RequestException, ordered_map
+from .util import handle_api_error, print_json_output, format_api_error
+from .index import resolve_site, resolve_device
+from .watch import flatten
+
+# Every device directory holds one fixed-width column of float64 values per
+# entry, all of the same length, so row ``i`` of each column is one sample.
+# Columns are written one after another, so after a crash or during an append
+# some may be longer than others; only the rows every column has are read.
+METRICS = [
+    'uptimeSec',
+    'cpuUtilizationPct',
+    'memoryUtilizationPct',
+    'loadAverage1Min',
+    'loadAverage5Min',
+    'loadAverage15Min',
+    'uplink.txRateBps',
+    'uplink.rxRateBps',
+]
+COLUMNS = ['ts'] + METRICS
+ITEM_SIZE = array('d').itemsize
+
+_DURATION_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([smhdw]?)$')
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def default_stats_dir():
+    base = os.environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share'
+    return Path(base) / 'unifi-cli' / 'stats'
+
+def parse_duration(value):
+    """Parse a duration such as ``90``, ``15m``, ``1h`` or ``7d`` into seconds."""
+    match = _DURATION_PATTERN.match(value.strip())
+    if not match:
+        raise click.BadParameter(f"Invalid duration '{value}', expected e.g. 30s, 15m, 1h or 7d.")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+def parse_time(value, now):
+    """Parse an ISO 8601 timestamp or a duration before ``now`` (e.g. ``1h``) into epoch seconds."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return now - parse_duration(value)
+
+def percentile(ordered, pct):
+    """Linear-interpolated percentile of an already sorted sequence."""
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(values, percentiles=()):
+    """Count, min, max, average and percentiles of a column slice, ignoring missing (NaN) samples.
+
+    Every pass runs in C over the slice (``filterfalse``, ``min``, ``max``,
+    ``math.fsum``); the slice is only sorted when percentiles are requested.
+    """
+    present = list(filterfalse(math.isnan, values))
+    if not present:
+        return {'count': 0}
+    summary = {
+        'count': len(present),
+        'min': min(present),
+        'max': max(present),
+        'avg': math.fsum(present) / len(present),
+    }
+    if percentiles:
+        present.sort()
+        for pct in percentiles:
+            summary[f"p{pct:g}"] = percentile(present, pct)
+    return summary
+
+def _value(sample, column):
+    value = sample.get(column)
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+class ColumnStore:
+    """An append-only, per-device columnar store of statistics samples.
+
+    Each column is a flat file of native float64 values; queries memory-map
+    the timestamp column, binary-search the requested window and copy only
+    that slice of each metric column.
+
+    A small ``columns.json`` file, always replaced last, records how many rows
+    are committed and which generation of column files is current. Appends
+    only count once it is written, and ``compact`` writes a whole new
+    generation before switching to it, so an interrupted write never leaves
+    readers with misaligned columns. Readers take a shared lock, writers an
+    exclusive one.
+    """
+
+    META = 'columns.json'
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else default_stats_dir()
+
+    def device_dir(self, site_id, device_id):
+        return self.root / site_id / device_id
+
+    def devices(self, site_id):
+        site_dir = self.root / site_id
+        if not site_dir.is_dir():
+            return []
+        return sorted(p.name for p in site_dir.iterdir() if (p / self.META).exists() or (p / 'ts.f64').exists())
+
+    def _locked(self, directory, shared=False):
+        directory.mkdir(parents=True, exist_ok=True)
+        lock = open(directory / '.lock', 'w')
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return lock
+
+    @staticmethod
+    def _column_path(directory, column, generation):
+        return directory / (f"{column}.f64" if generation == 0 else f"{column}.{generation}.f64")
+
+    def _meta(self, directory):
+        """Return ``(generation, rows)`` for a device directory."""
+        try:
+            with open(directory / self.META) as f:
+                meta = json.load(f)
+            return meta['generation'], meta['rows']
+        except FileNotFoundError:
+            pass
+        # Written before the marker existed: trust the shortest column.
+        try:
+            return 0, min((directory / f"{column}.f64").stat().st_size for column in COLUMNS) // ITEM_SIZE
+        except FileNotFoundError:
+            return 0, 0
+
+    def _commit(self, directory, generation, rows):
+        tmp = directory / f"{self.META}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'generation': generation, 'rows': rows}, f)
+        os.replace(tmp, directory / self.META)
+
+    def append(self, site_id, device_id, samples):
+        """Append flattened samples (dicts with a ``ts`` key) to a device's columns."""
+        directory = self.device_dir(site_id, device_id)
+        with self._locked(directory):
+            generation, rows = self._meta(directory)
+            size = rows * ITEM_SIZE
+            for column in COLUMNS:
+                values = array('d', (_value(sample, column) for sample in samples))
+                with open(self._column_path(directory, column, generation), 'ab') as f:
+                    # Drop the uncommitted tail of an append that was interrupted.
+                    if f.tell() != size:
+                        f.truncate(size)
+                    values.tofile(f)
+            self._commit(directory, generation, rows + len(samples))
+
+    def read(self, site_id, device_id, columns, since=None, until=None):
+        """Return ``{column: array('d')}`` for the samples with ``since <= ts <= until``."""
+        directory = self.device_dir(site_id, device_id)
+        if not directory.is_dir():
+            return {column: array('d') for column in ['ts'] + list(columns)}
+        with self._locked(directory, shared=True):
+            return self._read(directory, columns, since, until)
+
+    def _read(self, directory, columns, since=None, until=None):
+        result = {column: array('d') for column in ['ts'] + list(columns)}
+        generation, rows = self._meta(directory)
+        if rows == 0:
+            return result
+
+        ts_path = self._column_path(directory, 'ts', generation)
+        with open(ts_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as ts_map:
+            timestamps = memoryview(ts_map)[:rows * ITEM_SIZE].cast('d')
+            try:
+                low = bisect_left(timestamps, since) if since is not None else 0
+                high = max(low, bisect_right(timestamps, until)) if until is not None else rows
+            finally:
+                timestamps.release()
+            result['ts'].frombytes(ts_map[low * ITEM_SIZE:high * ITEM_SIZE])
+
+        for column in columns:
+            with open(self._column_path(directory, column, generation), 'rb') as f:
+                f.seek(low * ITEM_SIZE)
+                result[column].frombytes(f.read((high - low) * ITEM_SIZE))
+        return result
+
+    def compact(self, site_id, device_id, retention=None, older_than=None, resolution=None, now=None):
+        """Drop samples older than ``retention`` and average samples older than ``older_than``
+        into ``resolution``-sized buckets. Returns ``(rows_before, rows_after)``."""
+        now = now or time.time()
+        directory = self.device_dir(site_id, device_id)
+        with self._locked(directory):
+            generation, _ = self._meta(directory)
+            data = self._read(directory, METRICS)
+            timestamps = data['ts']
+            before = len(timestamps)
+
+            start = bisect_left(timestamps, now - retention) if retention is not None else 0
+            split = bisect_left(timestamps, now - older_than) if older_than is not None and resolution else start
+            split = max(split, start)
+
+            compacted = {column: array('d') for column in COLUMNS}
+            i = start
+            while i < split:
+                bucket = timestamps[i] - timestamps[i] % resolution
+                j = bisect_left(timestamps, bucket + resolution, i, split)
+                compacted['ts'].append(bucket)
+                for column in METRICS:
+                    present = [v for v in data[column][i:j] if v == v]
+                    compacted[column].append(math.fsum(present) / len(present) if present else math.nan)
+                i = j
+            for column in COLUMNS:
+                compacted[column].extend(data[column][split:])
+
+            # Write the next generation in full, switch to it, then drop the old one.
+            for column in COLUMNS:
+                with open(self._column_path(directory, column, generation + 1), 'wb') as f:
+                    compacted[column].tofile(f)
+            self._commit(directory, generation + 1, len(compacted['ts']))
+            for column in COLUMNS:
+                self._column_path(directory, column, generation).unlink(missing_ok=True)
+        return before, len(compacted['ts'])
+
+@click.group()
+def stats():
+    """Record and query device statistics in a local time-series store."""
+    pass
+
+def store_for(config):
+    return ColumnStore(config.stats_dir)
+
+def stored_site_id(config, store, site_id):
+    """The site directory to read: ``site_id`` as given if it has recorded data, else the resolved ID."""
+    if store.devices(site_id):
+        return site_id
+    return resolve_site(config.client, site_id)
+
+def site_device_ids(config, site_id, device_ids):
+    if device_ids:
+        return [resolve_device(config.client, site_id, d) for d in device_ids]
+    devices = config.client.get_all(f"/sites/{site_id}/devices", page_size=200)
+    return [device['id'] for device in devices.get('data', [])]
+
+@stats.command('record')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', 'device_ids', multiple=True, help='Device ID, name, MAC or IP to record (repeatable; default: every device on the site).')
+@click.option('--interval', type=float, default=60, help='Seconds between samples.')
+@click.option('--duration', help='Stop after this long (e.g. 1h); default: run until interrupted.')
+@pass_config
+def record_stats(config, site_id, device_ids, interval, duration):
+    """Sample latest device statistics on an interval and append them to the local store."""
+    duration = parse_duration(duration) if duration else None
+    store = store_for(config)
+    try:
+        site_id = resolve_site(config.client, site_id)
+        device_ids = site_device_ids(config, site_id, device_ids)
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    def poll(device_id):
+        try:
+            return config.client.get_json(f"/sites/{site_id}/devices/{device_id}/statistics/latest", cached=False)
+        except ApiError as e:
+            return format_api_error(e.response)
+        except RequestException as e:
+            return str(e)
+
+    start = time.time()
+    recorded = 0
+    try:
+        while True:
+            tick = time.time()
+            for device_id, result in zip(device_ids, ordered_map(poll, device_ids, config.max_workers)):
+                if isinstance(result, str):
+                    click.echo(f"Device {device_id}: {result}", err=True)
+                    continue
+                store.append(site_id, device_id, [{'ts': tick, **flatten(result)}])
+                recorded += 1
+            click.echo(f"Recorded {recorded} samples.", err=True)
+            if duration is not None and time.time() - start + interval > duration:
+                break
+            time.sleep(max(0.0, interval - (time.time() - tick)))
+    except KeyboardInterrupt:
+        pass
+
+@stats.command('query')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--device-id', 'device_ids', multiple=True, help='Device ID, name, MAC or IP to query (repeatable; default: every recorded device).')
+@click.option('--metric', 'metrics', multiple=True, type=click.Choice(METRICS), help='Metric to aggregate (repeatable; default: all).')
+@click.option('--since', default='1h', help='Window start: ISO 8601 time or a duration ago (e.g. 1h).')
+@click.option('--until', help='Window end: ISO 8601 time or a duration ago (default: now).')
+@click.option('--bucket', help='Aggregate per time bucket of this size (e.g. 5m) instead of the whole window.')
+@click.option('--percentile', 'percentiles', multiple=True, type=click.FloatRange(0, 100), default=(50, 95, 99), help='Percentiles to compute (repeatable).')
+@click.option('--json', is_flag=True, help='Output raw JSON.')
+@click.option('--query', help='JMESPath query to apply to the JSON output.')
+@pass_config
+def query_stats(config, site_id, device_ids, metrics, since, until, bucket, percentiles, json, query):
+    """Compute min/max/avg/percentiles of recorded statistics over a time window."""
+    now = time.time()
+    since = parse_time(since, now)
+    until = parse_time(until, now) if until else now
+    if since > until:
+        raise click.BadParameter('the window starts after it ends; --since must be earlier than --until.',
+                                 param_hint="'--since'")
+    bucket = parse_duration(bucket) if bucket else None
+    if bucket is not None and bucket <= 0:
+        raise click.BadParameter('must be longer than zero.', param_hint="'--bucket'")
+    metrics = list(metrics or METRICS)
+    store = store_for(config)
+
+    try:
+        if device_ids:
+            site_id = resolve_site(config.client, site_id)
+            device_ids = [resolve_device(config.client, site_id, d) for d in device_ids]
+        else:
+            site_id = stored_site_id(config, store, site_id)
+            device_ids = store.devices(site_id)
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+
+    result = {}
+    for device_id in device_ids:
+        data = store.read(site_id, device_id, metrics, since, until)
+        timestamps = data['ts']
+        if bucket is None:
+            result[device_id] = {m: summarize(data[m], percentiles) for m in metrics}
+            continue
+        buckets = []
+        start = since - since % bucket
+        while start <= until:
+            low = bisect_left(timestamps, start)
+            high = bisect_left(timestamps, start + bucket)
+            if high > low:
+                buckets.append({
+                    'start': datetime.fromtimestamp(start).astimezone().isoformat(),
+                    **{m: summarize(data[m][low:high], percentiles) for m in metrics}
+                })
+            start += bucket
+        result[device_id] = buckets
+    print_json_output(result, raw_json=json, query=query)
+
+@stats.command('compact')
+@click.option('--site-id', required=True, help='The ID or name of the site.')
+@click.option('--retention', help='Delete samples older than this (e.g. 90d).')
+@click.option('--older-than', help='Downsample samples older than this (e.g. 7d)...')
+@click.option('--resolution', default='5m', help='...into buckets of this size (e.g. 5m).')
+@pass_config
+def compact_stats(config, site_id, retention, older_than, resolution):
+    """Apply retention and downsampling to recorded statistics."""
+    retention = parse_duration(retention) if retention else None
+    older_than = parse_duration(older_than) if older_than else None
+    resolution = parse_duration(resolution)
+    if resolution <= 0:
+        raise click.BadParameter('must be longer than zero.', param_hint="'--resolution'")
+    store = store_for(config)
+    try:
+        site_id = stored_site_id(config, store, site_id)
+    except ApiError as e:
+        handle_api_error(e.response)
+        return
+    except RequestException as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    for device_id in store.devices(site_id):
+        before, after = store.compact(site_id, device_id, retention=retention, older_than=older_than,
+                                      resolution=resolution)
+        click.echo(f"Device {device_id}: {before} -> {after} samples.")
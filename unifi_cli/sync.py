@@ -0,0 +1,178 @@
+import os
+import json
+import fcntl
+import hashlib
+import click
+from pathlib import Path
+from .config import pass_config
+from .api import ApiError, RequestException, ordered_map
+from .util import dumps, format_api_error
+from .fleet import resolve_sites
+
+# Resource name -> list endpoint. Records are keyed by ``id``, falling back to
+# ``macAddress``.
+RESOURCES = {
+    'devices': '/sites/{site_id}/devices',
+    'clients': '/sites/{site_id}/clients',
+}
+
+def default_snapshot_dir():
+    base = os.environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share'
+    return Path(base) / 'unifi-cli' / 'snapshots'
+
+def record_key(record):
+    return record.get('id') or record.get('macAddress')
+
+def record_hash(record):
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+def index_records(records, ignore=()):
+    """Map each record's key to ``(hash, record)``, dropping ignored fields first."""
+    indexed = {}
+    for record in records:
+        key = record_key(record)
+        if key is None:
+            continue
+        if ignore:
+            record = {k: v for k, v in record.items() if k not in ignore}
+        indexed[key] = (record_hash(record), record)
+    return indexed
+
+def diff_records(old, new):
+    """Yield ``(event, key, old_record, new_record)`` for every added, removed or modified key.
+
+    Only records whose hashes differ are compared field by field.
+    """
+    for key, (digest, record) in new.items():
+        previous = old.get(key)
+        if previous is None:
+            yield 'add', key, None, record
+        elif previous[0] != digest and previous[1] != record:
+            yield 'modify', key, previous[1], record
+    for key, (_, record) in old.items():
+        if key not in new:
+            yield 'remove', key, record, None
+
+def changed_fields(old, new):
+    return {
+        field: {'old': old.get(field), 'new': new.get(field)}
+        for field in sorted(old.keys() | new.keys())
+        if old.get(field) != new.get(field)
+    }
+
+class SnapshotStore:
+    """The last synced records of each site and resource, one JSON file each.
+
+    Snapshots of a named controller profile live in a directory of their own,
+    so the same site ID on two controllers is never compared across them.
+    """
+
+    def __init__(self, root=None, controller=None):
+        self.root = Path(root) if root else default_snapshot_dir()
+        if controller:
+            self.root = self.root / 'controllers' / controller
+
+    def path(self, site_id, resource):
+        return self.root / site_id / f"{resource}.json"
+
+    def lock(self, site_id, resource):
+        path = self.path(site_id, resource)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(path.with_suffix('.lock'), 'w')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def load(self, site_id, resource):
+        """Return ``{key: (hash, record)}``, or None if the site has never been synced."""
+        path = self.path(site_id, resource)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return {key: tuple(entry) for key, entry in json.load(f).items()}
+
+    def save(self, site_id, resource, indexed):
+        path = self.path(site_id, resource)
+        tmp = path.with_suffix('.json.tmp')
+        with open(tmp, 'w') as f:
+            f.write(dumps(indexed))
+        os.replace(tmp, path)
+
+def sync_site(client, store, site, resource, ignore=(), initial=True, dry_run=False):
+    """Fetch one resource of one site, diff it against its snapshot and return the events."""
+    path = RESOURCES[resource].format(site_id=site['id'])
+    records = []
+    for page in client.iter_pages(path, page_size=200, cached=False):
+        records.extend(page.get('data', []))
+    new = index_records(records, ignore)
+
+    with store.lock(site['id'], resource):
+        old = store.load(site['id'], resource)
+        events = []
+        if old is not None or initial:
+            for event, key, before, after in diff_records(old or {}, new):
+                entry = {'event': event, 'resource': resource, 'siteId': site['id'],
+                         'siteName': site.get('name'), 'key': key}
+                if event == 'modify':
+                    entry['name'] = after.get('name')
+                    entry['changes'] = changed_fields(before, after)
+                else:
+                    entry['record'] = after if event == 'add' else before
+                events.append(entry)
+        if not dry_run:
+            store.save(site['id'], resource, new)
+    return events
+
+@click.command('sync')
+@click.option('--site-id', help='The ID or name of the site, or a comma-separated list or glob of site IDs/names.')
+@click.option('--all-sites', is_flag=True, help='Sync every site.')
+@click.option('--resource', 'resources', multiple=True, type=click.Choice(list(RESOURCES)), help='Resource to sync (repeatable; default: all).')
+@click.option('--ignore', 'ignore', multiple=True, help='Field to leave out of comparisons, e.g. a volatile counter (repeatable).')
+@click.option('--no-initial', is_flag=True, help="Don't emit add events for sites synced for the first time.")
+@click.option('--dry-run', is_flag=True, help='Print the changes without updating the snapshots.')
+@click.option('--concurrency', type=int, help='Number of site/resource pairs synced concurrently (default: max_workers).')
+@pass_config
+def sync(config, site_id, all_sites, resources, ignore, no_initial, dry_run, concurrency):
+    """Print what changed in devices and clients since the last sync as NDJSON events.
+
+    Each run fetches the current inventory, compares it with the local
+    snapshot of each site by id (or MAC address) and prints one add, remove
+    or modify event per changed record; modify events only carry the fields
+    that changed.
+    """
+    if not site_id and not all_sites:
+        raise click.UsageError('Either --site-id or --all-sites is required.')
+    store = SnapshotStore(config.snapshot_dir, config.controller)
+    resources = list(resources or RESOURCES)
+    ignore = frozenset(ignore)
+    client = config.client
+
+    try:
+        sites = resolve_sites(client, None if all_sites else site_id)
+    except ApiError as e:
+        raise click.ClickException(format_api_error(e.response))
+    except RequestException as e:
+        raise click.ClickException(str(e))
+    if not sites:
+        raise click.ClickException(f"No sites match '{site_id}'.")
+
+    def run(job):
+        site, resource = job
+        try:
+            return sync_site(client, store, site, resource, ignore, initial=not no_initial, dry_run=dry_run)
+        except ApiError as e:
+            return format_api_error(e.response)
+        except RequestException as e:
+            return str(e)
+
+    jobs = [(site, resource) for site in sites for resource in resources]
+    failed = 0
+    for (site, resource), result in zip(jobs, ordered_map(run, jobs, concurrency or config.max_workers)):
+        if isinstance(result, str):
+            failed += 1
+            click.echo(f"Site {site['id']} {resource}: {result}", err=True)
+            continue
+        if result:
+            click.echo('\n'.join(dumps(event) for event in result))
+    if failed:
+        click.get_current_context().exit(1)
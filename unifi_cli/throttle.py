@@ -0,0 +1,173 @@
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from pathlib import Path
+from .cache import default_cache_dir
+
+CONGESTION_STATUSES = (429, 500, 502, 503, 504)
+
+# AIMD tuning: halve the concurrency limit on congestion (at most once per
+# DECREASE_INTERVAL seconds, so a burst of failures counts once), and grow it
+# by roughly one slot per limit's worth of healthy responses.
+DECREASE_FACTOR = 0.5
+DECREASE_INTERVAL = 1.0
+# A response slower than both LATENCY_FLOOR seconds and LATENCY_SPIKE times
+# the moving average (once LATENCY_SAMPLES responses have been seen) counts as
+# congestion.
+LATENCY_FLOOR = 0.5
+LATENCY_SPIKE = 3.0
+LATENCY_SAMPLES = 10
+LATENCY_ALPHA = 0.1
+
+def default_state_dir():
+    return default_cache_dir() / 'throttle'
+
+def _congested(response):
+    """Whether a response (None for a failed request) signals an overloaded controller.
+
+    Responses that only succeeded after urllib3 retried a 429/5xx count too.
+    """
+    if response is None:
+        return True
+    if response.status_code in CONGESTION_STATUSES:
+        return True
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return any(h.status in CONGESTION_STATUSES or h.error for h in getattr(retries, 'history', ()))
+
+def _retry_after(response):
+    if response is None or response.status_code != 429:
+        return 0.0
+    try:
+        return float(response.headers.get('Retry-After', 0))
+    except ValueError:
+        return 0.0
+
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads. A rate of None means unlimited.
+
+    This is the per-command ``--rate`` pacing of bulk and batch runs; it is
+    local to the process and applies on top of the shared ``Throttle``.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class Throttle:
+    """A token-bucket rate limit plus AIMD adaptive concurrency for one controller.
+
+    The bucket, the concurrency limit and the latency average live in a small
+    state file guarded by ``flock``, so every unifi process talking to the same
+    controller (parallel cron jobs, the daemon) shares one budget and backs off
+    together. The concurrency limit is enforced per process.
+
+    Each request costs one locked read-modify-write of the state file when it
+    starts and, in adaptive mode, another when it finishes (a fraction of a
+    millisecond on a local disk), which is why adaptive mode is opt-in.
+    """
+
+    def __init__(self, controller, rate=None, burst=10, max_concurrency=10, adaptive=False, state_dir=None):
+        self.rate = rate or None
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.adaptive = adaptive
+        state_dir = Path(state_dir) if state_dir else default_state_dir()
+        state_dir.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha256(controller.encode()).hexdigest()[:16]
+        self.path = state_dir / f"{name}.json"
+        self.limit = float(self.max_concurrency)
+        self._inflight = 0
+        self._gate = threading.Condition()
+
+    def _update(self, change):
+        """Apply ``change(state, now)`` to the shared state under the file lock and return its result."""
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or '{}')
+            except ValueError:
+                state = {}
+            now = time.time()
+            state.setdefault('tokens', float(self.burst))
+            state.setdefault('updated', now)
+            state.setdefault('limit', float(self.max_concurrency))
+            result = change(state, now)
+            state['limit'] = min(state['limit'], float(self.max_concurrency))
+            self.limit = state['limit'] if self.adaptive else float(self.max_concurrency)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+        return result
+
+    def _take_token(self, state, now):
+        """Reserve a token and return how long to wait before using it."""
+        wait = max(0.0, state.get('blocked_until', 0) - now)
+        if self.rate:
+            tokens = min(self.burst, state['tokens'] + (now - state['updated']) * self.rate)
+            state['tokens'] = tokens - 1
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / self.rate)
+        state['updated'] = now
+        return wait
+
+    def acquire(self):
+        """Block until this process may start another request."""
+        with self._gate:
+            while self._inflight >= max(1, int(self.limit)):
+                self._gate.wait()
+            self._inflight += 1
+        try:
+            wait = self._update(self._take_token)
+        except BaseException:
+            self._leave()
+            raise
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self, response, latency):
+        """Record the outcome of a request started with ``acquire()``."""
+        if self.adaptive or _retry_after(response):
+            def feedback(state, now):
+                congested = _congested(response)
+                average = state.get('latency')
+                samples = state.get('samples', 0)
+                if (response is not None and average and samples >= LATENCY_SAMPLES
+                        and latency > max(LATENCY_FLOOR, average * LATENCY_SPIKE)):
+                    congested = True
+                if response is not None:
+                    state['latency'] = latency if average is None else average + LATENCY_ALPHA * (latency - average)
+                    state['samples'] = samples + 1
+                if self.adaptive:
+                    if not congested:
+                        state['limit'] = min(self.max_concurrency, state['limit'] + 1 / state['limit'])
+                    elif now - state.get('decreased_at', 0) >= DECREASE_INTERVAL:
+                        state['limit'] = max(1.0, state['limit'] * DECREASE_FACTOR)
+                        state['decreased_at'] = now
+                retry_after = _retry_after(response)
+                if retry_after:
+                    state['blocked_until'] = max(state.get('blocked_until', 0), now + retry_after)
+            try:
+                self._update(feedback)
+            finally:
+                self._leave()
+        else:
+            self._leave()
+
+    def _leave(self):
+        with self._gate:
+            self._inflight -= 1
+            self._gate.notify_all()
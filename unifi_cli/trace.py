@@ -0,0 +1,255 @@
+"""Request tracing (``unifi --trace``) and profiling (``unifi --profile``).
+
+While a Tracer is active, ``UnifiClient.request`` records one entry per HTTP
+request (connection setup, time to first byte, download, size, retries and
+the controller's request ID) and ``span()`` times the local work around it:
+cache lookups, JSON decoding, JMESPath queries and output formatting.
+"""
+import sys
+import json
+import time
+import threading
+import contextlib
+
+# The Tracer for the running command, or None when tracing is off.
+tracer = None
+
+# Connection setup timings of the current thread's request, filled in by the
+# instrumented connection classes (see ``instrument``).
+_connection = threading.local()
+
+_NOOP = contextlib.nullcontext()
+
+def span(name, **args):
+    """Time a block of local work when tracing is on."""
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, **args)
+
+def instrument(adapter):
+    """Make the connection pools of a requests adapter time DNS + TCP connect and the TLS handshake."""
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedConnection:
+        def _new_conn(self):
+            started = time.perf_counter()
+            try:
+                return super()._new_conn()
+            finally:
+                _connection.connect = time.perf_counter() - started
+
+    class TimedHTTPConnection(TimedConnection, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnection, HTTPSConnection):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                _connection.tls = time.perf_counter() - started - getattr(_connection, 'connect', 0)
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    adapter.poolmanager.pool_classes_by_scheme = {
+        'http': TimedHTTPConnectionPool,
+        'https': TimedHTTPSConnectionPool,
+    }
+
+def _request_id(response):
+    request_id = response.headers.get('X-Request-Id')
+    if request_id or response.ok:
+        return request_id
+    try:
+        return response.json().get('requestId')
+    except (ValueError, AttributeError):
+        return None
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def format_ms(seconds):
+    return '-' if seconds is None else f"{seconds * 1000:.1f}ms"
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024 or unit == 'MiB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
+class Tracer:
+    """Collects HTTP requests and local spans for one command invocation."""
+
+    def __init__(self, command=''):
+        self.command = command
+        self.started = time.perf_counter()
+        self.finished = None
+        self.requests = []
+        self.spans = []
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append({'name': name, 'start': started, 'duration': time.perf_counter() - started,
+                               'thread': threading.get_ident(), 'args': args})
+
+    def request(self, method, path, params, elapsed, response, waited=None):
+        """Record a finished request; ``elapsed`` covers sending it and reading the whole body."""
+        end = time.perf_counter()
+        connect = getattr(_connection, 'connect', None)
+        tls = getattr(_connection, 'tls', None)
+        _connection.connect = _connection.tls = None
+        record = {
+            'method': method,
+            'path': path,
+            'params': params,
+            'start': end - elapsed,
+            'total': elapsed,
+            'waited': waited,
+            'connect': connect,
+            'tls': tls,
+            'thread': threading.get_ident(),
+        }
+        if response is not None:
+            headers = response.elapsed.total_seconds()
+            retries = getattr(getattr(response.raw, 'retries', None), 'history', ())
+            record.update({
+                'status': response.status_code,
+                'ttfb': max(0.0, headers - (connect or 0) - (tls or 0)),
+                'download': max(0.0, elapsed - headers),
+                'bytes': len(response.content),
+                'retries': len(retries),
+                'requestId': _request_id(response),
+            })
+        self.requests.append(record)
+        self._local.last = record
+
+    def decode(self, response):
+        """Decode a JSON response, attributing the time to the request that fetched it."""
+        started = time.perf_counter()
+        data = response.json()
+        duration = time.perf_counter() - started
+        last = getattr(self._local, 'last', None)
+        if last is not None:
+            last['decode'] = duration
+        self.spans.append({'name': 'decode', 'start': started, 'duration': duration,
+                           'thread': threading.get_ident(), 'args': {'bytes': len(response.content)}})
+        return data
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self, slowest=5):
+        """A human-readable breakdown of where the time went."""
+        wall = (self.finished or time.perf_counter()) - self.started
+        requests = self.requests
+        lines = [f"Trace: {self.command} took {wall:.3f}s, {len(requests)} request(s), "
+                 f"{format_bytes(sum(r.get('bytes', 0) for r in requests))} received"]
+
+        if requests:
+            lines.append(f"  {'phase':<12} {'count':>6} {'total':>10} {'mean':>10} {'p95':>10} {'max':>10}")
+            for phase in ('waited', 'connect', 'tls', 'ttfb', 'download', 'decode', 'total'):
+                values = sorted(r[phase] for r in requests if r.get(phase) is not None)
+                if values:
+                    lines.append(f"  {phase:<12} {len(values):>6} {format_ms(sum(values)):>10} "
+                                 f"{format_ms(sum(values) / len(values)):>10} "
+                                 f"{format_ms(percentile(values, 95)):>10} {format_ms(values[-1]):>10}")
+
+        local = {}
+        for s in self.spans:
+            if s['name'] != 'decode':
+                count, total = local.get(s['name'], (0, 0.0))
+                local[s['name']] = count + 1, total + s['duration']
+        if local:
+            lines.append('  local work: ' + ', '.join(
+                f"{name} {format_ms(total)} ({count}x)" for name, (count, total) in sorted(local.items())))
+
+        if requests:
+            lines.append('  slowest requests:')
+            for r in sorted(requests, key=lambda r: r['total'], reverse=True)[:slowest]:
+                line = f"    {r['method']} {r['path']} {r.get('status', 'failed')} {format_ms(r['total'])}"
+                if 'bytes' in r:
+                    line += f" {format_bytes(r['bytes'])}"
+                if r.get('retries'):
+                    line += f" ({r['retries']} retries)"
+                if r.get('requestId'):
+                    line += f" [request {r['requestId']}]"
+                lines.append(line)
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """The trace in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        def us(seconds):
+            return round(seconds * 1e6, 1)
+
+        def event(name, category, start, duration, thread, args=None):
+            return {'name': name, 'cat': category, 'ph': 'X', 'ts': us(start - self.started), 'dur': us(duration),
+                    'pid': 1, 'tid': thread, 'args': args or {}}
+
+        end = self.finished or time.perf_counter()
+        events = [event(self.command or 'unifi', 'command', self.started, end - self.started,
+                        threading.main_thread().ident)]
+        for r in self.requests:
+            args = {k: v for k, v in r.items() if k not in ('start', 'thread') and v is not None}
+            events.append(event(f"{r['method']} {r['path']}", 'http', r['start'], r['total'], r['thread'], args))
+            offset = r['start']
+            for phase in ('connect', 'tls', 'ttfb', 'download'):
+                if r.get(phase):
+                    events.append(event(phase, 'http', offset, r[phase], r['thread']))
+                    offset += r[phase]
+        for s in self.spans:
+            events.append(event(s['name'], 'local', s['start'], s['duration'], s['thread'], s['args']))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+class Profiler:
+    """cProfile for every thread the command runs, merged into one set of stats.
+
+    Up to Python 3.11 a profiler only sees the thread that enabled it, so one
+    is started per thread. From 3.12 cProfile is built on ``sys.monitoring``,
+    which is process-wide: a single profiler covers every thread, and a
+    second one cannot be enabled.
+    """
+
+    PER_THREAD = sys.version_info < (3, 12)
+
+    def __init__(self):
+        self.profiles = []
+
+    def _start_thread(self, *args):
+        import cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        if self.PER_THREAD:
+            threading.setprofile(self._start_thread)
+        self._start_thread()
+
+    def stop(self):
+        if self.PER_THREAD:
+            threading.setprofile(None)
+        self.profiles[0].disable()
+
+    def stats(self, stream=None):
+        import pstats
+        stats = pstats.Stats(self.profiles[0], stream=stream or sys.stderr)
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        return stats
@@ -1,6 +1,18 @@
+import io
+import csv
 import click
 import json
-import jmespath
+from . import trace
+from .query import compile_query
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --format choices for list commands. json prints the whole (merged) response;
+# the others print one record per line/row and stream page by page.
+OUTPUT_FORMATS = ['json', 'ndjson', 'table', 'csv', 'tsv']
 
 def handle_api_error(response):
     """Parse and display a JSON error response from the API."""
@@ -18,12 +30,142 @@ def handle_api_error(response):
         click.echo(f"Error: {response.status_code} {response.reason}", err=True)
         click.echo(f"  Response: {response.text}", err=True)
 
+def format_api_error(response):
+    """Summarize a JSON error response from the API on a single line."""
+    try:
+        error_data = response.json()
+        status_code = error_data.get('statusCode', response.status_code)
+        status_name = error_data.get('statusName', 'Unknown Error')
+        message = error_data.get('message', 'No message provided.')
+        request_id = error_data.get('requestId', 'N/A')
+        return f"{status_code} ({status_name}) {message} [request {request_id}]"
+    except json.JSONDecodeError:
+        return f"{response.status_code} {response.reason}"
+
+def dumps(data, indent=None):
+    """Serialize to JSON, using orjson for compact output when it is installed."""
+    if indent is None and orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            pass
+    return json.dumps(data, indent=indent)
+
 def print_json_output(data, raw_json=False, query=None):
     """Prints JSON data, optionally unformatted or filtered by JMESPath."""
     if query:
-        data = jmespath.search(query, data)
+        with trace.span('query', expression=query):
+            data = compile_query(query)(data)
+
+    with trace.span('format'):
+        if raw_json:
+            click.echo(dumps(data))
+        else:
+            click.echo(dumps(data, indent=4))
+
+def parse_columns(value):
+    """Split a ``--columns`` value such as ``id,name,uplink.txRateBps``."""
+    if not value:
+        return None
+    return [column.strip() for column in value.split(',') if column.strip()]
+
+def format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return str(value)
+
+class RecordPrinter:
+    """Prints records as NDJSON, an aligned table, CSV or TSV, one page at a time.
+
+    The JMESPath query is applied to each record. Table/CSV/TSV columns are
+    taken from ``columns`` (field paths or JMESPath expressions) or else from
+    the keys of the first record; table column widths are sized from the
+    first page so that rows can be written as soon as they arrive.
+    """
+
+    def __init__(self, output_format='ndjson', query=None, columns=None):
+        self.output_format = output_format
+        self.query = query
+        self.search = compile_query(query) if query else None
+        self.columns = columns
+        self.getters = [compile_query(c) for c in columns] if columns else None
+        self.widths = None
+        self.started = False
+
+    def write(self, records):
+        if self.search:
+            with trace.span('query', expression=self.query, records=len(records)):
+                records = [r for r in map(self.search, records) if r is not None]
+        if not records:
+            return
+        with trace.span('format', records=len(records)):
+            self._write(records)
+
+    def _write(self, records):
+        if self.output_format == 'ndjson':
+            click.echo('\n'.join(dumps(record) for record in records))
+            return
+
+        if self.columns is None:
+            first = records[0]
+            self.columns = list(first) if isinstance(first, dict) else ['value']
+        if self.getters is None:
+            if isinstance(records[0], dict):
+                self.getters = [lambda r, key=key: r.get(key) if isinstance(r, dict) else None for key in self.columns]
+            else:
+                self.getters = [lambda r: r]
+        rows = [[format_cell(get(record)) for get in self.getters] for record in records]
+        self.write_rows(rows)
+
+    def write_rows(self, rows):
+        header = [] if self.started else [self.columns]
+        self.started = True
+        if self.output_format == 'table':
+            rows = [[' '.join(cell.split()) for cell in row] for row in rows]
+            if self.widths is None:
+                self.widths = [max(len(row[i]) for row in header + rows) for i in range(len(self.columns))]
+            lines = []
+            for row in header + rows:
+                cells = [cell.ljust(width) for cell, width in zip(row[:-1], self.widths)] + row[-1:]
+                lines.append('  '.join(cells).rstrip())
+            click.echo('\n'.join(lines))
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter='\t' if self.output_format == 'tsv' else ',', lineterminator='\n')
+        writer.writerows(header + rows)
+        click.echo(buffer.getvalue(), nl=False)
+
+    def finish(self):
+        """Print the header of an empty table/CSV/TSV result when the columns are known."""
+        if not self.started and self.columns and self.output_format != 'ndjson':
+            self.write_rows([])
+
+def print_list(client, path, params, page_size, fetch_all=False, raw_json=False, query=None, output_format='json',
+               columns=None):
+    """Fetches a paginated list endpoint and prints it in the requested format.
+
+    In the record formats (``ndjson``, ``table``, ``csv``, ``tsv``) records
+    are written page by page as they arrive, so the full result set is never
+    held in memory.
+    """
+    if output_format != 'json':
+        if fetch_all:
+            pages = client.iter_pages(path, params=params, page_size=page_size)
+        else:
+            pages = [client.get_json(path, params=params)]
+        printer = RecordPrinter(output_format, query=query, columns=columns)
+        for page in pages:
+            printer.write(page.get('data', []))
+        printer.finish()
+        return
 
-    if raw_json:
-        click.echo(json.dumps(data))
+    if fetch_all:
+        data = client.get_all(path, params=params, page_size=page_size)
     else:
-        click.echo(json.dumps(data, indent=4))
+        data = client.get_json(path, params=params)
+    print_json_output(data, raw_json=raw_json, query=query)
@@ -0,0 +1,152 @@
+import re
+import time
+import heapq
+import operator
+from collections import deque
+from datetime import datetime
+from .api import ApiError, RequestException, ordered_map
+from .util import format_api_error
+
+# Fields in /statistics/latest that describe the poll itself rather than the device.
+IGNORED_FIELDS = {'lastHeartbeatAt', 'nextHeartbeatAt'}
+
+_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+_THRESHOLD_PATTERN = re.compile(r'^\s*([\w.]+)\s*(>=|<=|>|<)\s*([-+\d.eE]+)\s*$')
+
+class Threshold:
+    """A ``field<op>value`` expression such as ``cpuUtilizationPct>80`` or ``uplink.txRateBps>=1e8``."""
+
+    def __init__(self, expression):
+        match = _THRESHOLD_PATTERN.match(expression)
+        if not match:
+            raise ValueError(f"Invalid threshold '{expression}', expected e.g. 'cpuUtilizationPct>80'.")
+        self.expression = expression.strip()
+        self.field, op, value = match.groups()
+        self.compare = _OPERATORS[op]
+        self.value = float(value)
+
+    def breached(self, sample):
+        value = sample.get(self.field)
+        return isinstance(value, (int, float)) and self.compare(value, self.value)
+
+def flatten(stats, prefix=''):
+    """Flatten nested statistics into dotted keys (``uplink.txRateBps``), skipping lists."""
+    flat = {}
+    for key, value in stats.items():
+        if not prefix and key in IGNORED_FIELDS:
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif not isinstance(value, list):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+class DeviceWatch:
+    """Tracks one device's last sample, threshold state and a bounded ring buffer per numeric field."""
+
+    def __init__(self, device_id, window):
+        self.device_id = device_id
+        self.window = window
+        self.last = {}
+        self.history = {}
+        self.breached = set()
+
+    def update(self, sample, thresholds, timestamp):
+        """Record a flattened sample and return the events it produces."""
+        events = []
+        changed = {k: v for k, v in sample.items() if self.last.get(k) != v}
+        for key, value in sample.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.history.setdefault(key, deque(maxlen=self.window)).append(value)
+        self.last = sample
+
+        if changed:
+            events.append({
+                'ts': timestamp,
+                'deviceId': self.device_id,
+                'event': 'change',
+                'changed': changed,
+                'avg': {k: round(sum(self.history[k]) / len(self.history[k]), 3)
+                        for k in changed if k in self.history},
+            })
+
+        for threshold in thresholds:
+            breached = threshold.breached(sample)
+            if breached == (threshold.expression in self.breached):
+                continue
+            if breached:
+                self.breached.add(threshold.expression)
+            else:
+                self.breached.discard(threshold.expression)
+            events.append({
+                'ts': timestamp,
+                'deviceId': self.device_id,
+                'event': 'threshold',
+                'threshold': threshold.expression,
+                'state': 'breached' if breached else 'cleared',
+                'value': sample.get(threshold.field),
+            })
+        return events
+
+def next_poll_at(stats, now, min_interval, max_interval):
+    """Schedule the next poll at the device's next heartbeat, clamped to [min_interval, max_interval]."""
+    heartbeat = parse_timestamp(stats.get('nextHeartbeatAt')) if stats else None
+    if heartbeat is None:
+        return now + max_interval
+    return min(max(heartbeat, now + min_interval), now + max_interval)
+
+def watch(client, site_id, device_ids, emit, thresholds=(), window=12, min_interval=5.0,
+          max_interval=60.0, duration=None, thresholds_only=False):
+    """Poll the latest statistics of many devices until ``duration`` elapses, calling ``emit`` per event.
+
+    Devices due at the same time are polled concurrently over the client's
+    shared connection pool; each device is then rescheduled for its own
+    ``nextHeartbeatAt``.
+    """
+    watches = {device_id: DeviceWatch(device_id, window) for device_id in device_ids}
+    start = time.time()
+    schedule = [(start, device_id) for device_id in device_ids]
+    heapq.heapify(schedule)
+
+    def poll(device_id):
+        try:
+            return client.get_json(f"/sites/{site_id}/devices/{device_id}/statistics/latest", cached=False)
+        except ApiError as e:
+            return format_api_error(e.response)
+        except RequestException as e:
+            return str(e)
+
+    while schedule:
+        due_at = schedule[0][0]
+        if duration is not None and due_at - start > duration:
+            break
+        delay = due_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.time()
+        due = []
+        while schedule and schedule[0][0] <= now:
+            due.append(heapq.heappop(schedule)[1])
+
+        for device_id, stats in zip(due, ordered_map(poll, due, client.max_workers)):
+            now = time.time()
+            if isinstance(stats, str):
+                emit({'ts': now, 'deviceId': device_id, 'event': 'error', 'error': stats})
+                heapq.heappush(schedule, (now + max_interval, device_id))
+                continue
+            for event in watches[device_id].update(flatten(stats), thresholds, now):
+                if not thresholds_only or event['event'] != 'change':
+                    emit(event)
+            heapq.heappush(schedule, (next_poll_at(stats, now, min_interval, max_interval), device_id))